@@ -1,24 +1,38 @@
+import asyncio
 import tkinter as tk
-from face_tracker import start_face_mesh_tracking, stop_face_mesh_tracking, set_secondary_frame_callback as set_face_mesh_callback
-from pose_tracker import start_pose_tracking, stop_pose_tracking
-from body_tracker import start_body_tracking, stop_body_tracking, set_secondary_frame_callback as set_body_callback
+from face_tracker import set_secondary_frame_callback as set_face_mesh_callback
+from body_tracker import set_secondary_frame_callback as set_body_callback
+from tracker_session import TrackerSession
 import threading
 import cv2
+import numpy as np
 from PIL import Image, ImageTk
 
+# Maximum refresh rate of the secondary display
+DISPLAY_FPS = 30
+
 
 class MultiTrackerApp:
-    def __init__(self, root):
+    def __init__(self, root, display=None):
         self.root = root
+        self.display = display  # DisplayMultiplexer drawn from the Tk loop, or None when headless
         self.root.title("Multi-Tracker Application")
-        self.tracking_threads = {
-            "pose": None,
-            "face_mesh": None,
-            "body": None,
-        }
+        # Trackers are driven from one asyncio loop on a background thread, so Tk never blocks on them
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, name="TrackerSessions", daemon=True).start()
+        self.sessions = {pipeline: TrackerSession(pipeline) for pipeline in ("pose", "face_mesh", "body")}
         self.secondary_window = None
         self.canvas = None
-        self.secondary_image = None
+        self.canvas_image = None  # Single canvas item reused for every frame
+        self.secondary_image = None  # PhotoImage updated in place with paste()
+
+        # Latest-frame-wins slot shared with the tracker threads. Trackers copy into
+        # pending_frame; the Tk loop swaps it with display_frame before converting.
+        self.frame_lock = threading.Lock()
+        self.pending_frame = None
+        self.display_frame = None
+        self.has_pending_frame = False
+        self.rgb_frame = None
 
         # Create UI components
         self.create_widgets()
@@ -27,6 +41,11 @@ class MultiTrackerApp:
         set_face_mesh_callback(self.update_secondary_display)
         set_body_callback(self.update_secondary_display)
 
+        # Poll for new frames from the Tk main loop at a capped rate
+        self.root.after(1000 // DISPLAY_FPS, self.refresh_secondary_display)
+        if self.display is not None:
+            self.root.after(1000 // DISPLAY_FPS, self.refresh_tracker_display)
+
     def create_widgets(self):
         # Pose Tracker Section
         pose_label = tk.Label(self.root, text="Pose Tracker", font=("Arial", 12, "bold"))
@@ -74,59 +93,99 @@ class MultiTrackerApp:
         exit_button = tk.Button(self.root, text="Exit", command=self.exit_app, bg="gray", fg="white")
         exit_button.pack(pady=20)
 
-    def create_secondary_window(self):
+    def create_secondary_window(self, width=640, height=480):
         """Create a secondary window for the blank frame display."""
         if self.secondary_window is None or not self.secondary_window.winfo_exists():
             self.secondary_window = tk.Toplevel(self.root)
             self.secondary_window.title("Secondary Display")
-            self.canvas = tk.Canvas(self.secondary_window, width=640, height=480, bg="black")  # Set default size and background
+            self.canvas = tk.Canvas(self.secondary_window, width=width, height=height, bg="black")  # Set default size and background
             self.canvas.pack()
+            self.canvas_image = None
 
-    def update_secondary_display(self, frame):
-        """Update the secondary window with the processed frame."""
-        self.create_secondary_window()
+        if self.secondary_image is None or (self.secondary_image.width(), self.secondary_image.height()) != (width, height):
+            self.secondary_image = ImageTk.PhotoImage("RGB", (width, height))
+            self.canvas.config(width=width, height=height)
+            self.canvas_image = None
 
-        # Convert OpenCV frame to a Tkinter-compatible format
-        cv_image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        img = Image.fromarray(cv_image)
-        self.secondary_image = ImageTk.PhotoImage(image=img)
+        if self.canvas_image is None:
+            self.canvas_image = self.canvas.create_image(0, 0, anchor=tk.NW, image=self.secondary_image)
 
-        # Efficiently update the Canvas with the new image
-        self.canvas.create_image(0, 0, anchor=tk.NW, image=self.secondary_image)
+    def update_secondary_display(self, frame):
+        """Hand a processed frame to the secondary display.
+
+        Called from tracker threads, so it never touches Tk. The frame is copied into the pending
+        slot, replacing any frame the display has not picked up yet.
+        """
+        with self.frame_lock:
+            if self.pending_frame is None or self.pending_frame.shape != frame.shape:
+                self.pending_frame = np.empty_like(frame)
+            np.copyto(self.pending_frame, frame)
+            self.has_pending_frame = True
+
+    def refresh_secondary_display(self):
+        """Show the latest pending frame, if any, then schedule the next refresh."""
+        with self.frame_lock:
+            if self.has_pending_frame:
+                self.pending_frame, self.display_frame = self.display_frame, self.pending_frame
+                self.has_pending_frame = False
+                frame = self.display_frame
+            else:
+                frame = None
+
+        if frame is not None:
+            height, width = frame.shape[:2]
+            self.create_secondary_window(width, height)
+
+            # Convert into a reused RGB buffer and paste it into the existing PhotoImage
+            if self.rgb_frame is None or self.rgb_frame.shape != frame.shape:
+                self.rgb_frame = np.empty_like(frame)
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self.rgb_frame)
+            self.secondary_image.paste(Image.frombuffer("RGB", (width, height), self.rgb_frame, "raw", "RGB", 0, 1))
+
+        self.root.after(1000 // DISPLAY_FPS, self.refresh_secondary_display)
+
+    def refresh_tracker_display(self):
+        """Draw the trackers' camera views on this (main) thread, then schedule the next refresh."""
+        self.display.pump()
+        self.root.after(1000 // DISPLAY_FPS, self.refresh_tracker_display)
+
+    def start_session(self, pipeline):
+        """Start a tracker unless it is already running."""
+        future = asyncio.run_coroutine_threadsafe(self.sessions[pipeline].start(), self.loop)
+        try:
+            future.result()
+        except RuntimeError as e:
+            print(f"Error: {e}")
 
     def start_pose_tracking(self):
-        """Start Pose Tracking in a separate thread."""
-        if self.tracking_threads["pose"] is None or not self.tracking_threads["pose"].is_alive():
-            self.tracking_threads["pose"] = threading.Thread(target=start_pose_tracking)
-            self.tracking_threads["pose"].start()
+        """Start Pose Tracking."""
+        self.start_session("pose")
 
     def stop_pose_tracking(self):
         """Stop Pose Tracking."""
-        stop_pose_tracking()
+        self.sessions["pose"].request_stop()
 
     def start_face_mesh_tracking(self):
-        """Start Face Mesh Tracking in a separate thread."""
-        if self.tracking_threads["face_mesh"] is None or not self.tracking_threads["face_mesh"].is_alive():
-            self.tracking_threads["face_mesh"] = threading.Thread(target=start_face_mesh_tracking)
-            self.tracking_threads["face_mesh"].start()
+        """Start Face Mesh Tracking."""
+        self.start_session("face_mesh")
 
     def stop_face_mesh_tracking(self):
         """Stop Face Mesh Tracking."""
-        stop_face_mesh_tracking()
+        self.sessions["face_mesh"].request_stop()
 
     def start_body_tracking(self):
-        """Start Body Tracking in a separate thread."""
-        if self.tracking_threads["body"] is None or not self.tracking_threads["body"].is_alive():
-            self.tracking_threads["body"] = threading.Thread(target=start_body_tracking)
-            self.tracking_threads["body"].start()
+        """Start Body Tracking."""
+        self.start_session("body")
 
     def stop_body_tracking(self):
         """Stop Body Tracking."""
-        stop_body_tracking()
+        self.sessions["body"].request_stop()
 
     def exit_app(self):
         """Stop all trackers and exit the application."""
         self.stop_pose_tracking()
         self.stop_face_mesh_tracking()
         self.stop_body_tracking()
-        self.root.quit()
\ No newline at end of file
+        if self.display is not None:
+            self.display.close()
+        self.root.quit()
@@ -0,0 +1,212 @@
+# batch_process.py
+#
+# Run a tracker pipeline over recorded videos and image folders without a display.
+#
+#   python batch_process.py clips/*.mp4 sessions/day1 --pipeline pose --output-dir landmarks
+
+import argparse
+import glob
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+
+from exercises import CURLS, RepCounter
+from inference_pool import create_model, max_detections
+from landmark_arrays import LANDMARK_FIELDS, NUM_LANDMARKS, extract_landmarks, landmarks_to_array
+from landmark_recorder import LandmarkRecorder
+
+VIDEO_EXTENSIONS = {".mp4", ".avi", ".mov", ".mkv", ".webm", ".m4v"}
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp"}
+
+# Models run by each tracker pipeline
+PIPELINES = {
+    "pose": ("pose",),
+    "face_mesh": ("face_mesh",),
+    "body": ("pose", "hands"),
+}
+
+
+def collect_sources(inputs):
+    """Expand files, globs and directories into (name, kind, paths) jobs.
+
+    Each video file is one job. Each directory of images is one job whose images are
+    processed in sorted order as a single sequence.
+    """
+    sources = []
+    for pattern in inputs:
+        paths = sorted(glob.glob(pattern)) or [pattern]
+        for path in paths:
+            if os.path.isdir(path):
+                entries = sorted(os.path.join(path, name) for name in os.listdir(path))
+                images = [p for p in entries if os.path.splitext(p)[1].lower() in IMAGE_EXTENSIONS]
+                videos = [p for p in entries if os.path.splitext(p)[1].lower() in VIDEO_EXTENSIONS]
+                if images:
+                    sources.append((os.path.basename(os.path.normpath(path)), "images", images))
+                sources.extend((os.path.splitext(os.path.basename(p))[0], "video", [p]) for p in videos)
+            elif os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS:
+                sources.append((os.path.splitext(os.path.basename(path))[0], "images", [path]))
+            elif os.path.isfile(path):
+                sources.append((os.path.splitext(os.path.basename(path))[0], "video", [path]))
+            else:
+                print(f"Warning: No such file or directory: {path}")
+    return sources
+
+
+def read_frames(kind, paths):
+    """Yield (timestamp, BGR frame) from a video file or a list of images."""
+    if kind == "images":
+        for index, path in enumerate(paths):
+            frame = cv2.imread(path)
+            if frame is None:
+                print(f"Warning: Could not read image {path}")
+                continue
+            yield float(index), frame
+        return
+
+    cap = cv2.VideoCapture(paths[0])
+    if not cap.isOpened():
+        print(f"Error: Could not open video {paths[0]}")
+        return
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0, frame
+    finally:
+        cap.release()
+
+
+def process_source(pipeline, name, kind, paths, output_path):
+    """Run one pipeline over one source and save its per-frame landmarks.
+
+    Landmarks are saved as .npz arrays, or as a landmark recording when output_path ends
+    in .lmk. Returns (name, frame_count, seconds).
+    """
+    # Images in a folder are unrelated stills, so tracking between them is disabled
+    settings = {"static_image_mode": kind == "images"}
+    models = {model: create_model(model, **settings) for model in PIPELINES[pipeline]}
+    frames = {model: [] for model in models}
+    presence = {model: [] for model in models}
+    timestamps = []
+    curls = []
+    rep_counter = RepCounter(CURLS)
+    recorder = LandmarkRecorder(output_path) if output_path.endswith(".lmk") else None
+
+    start = time.perf_counter()
+    try:
+        for timestamp, frame in read_frames(kind, paths):
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            timestamps.append(timestamp)
+
+            for model, solution in models.items():
+                detections = max_detections(model, settings)
+                landmarks = np.zeros((detections, NUM_LANDMARKS[model], LANDMARK_FIELDS), dtype=np.float32)
+                present = np.zeros(detections, dtype=bool)
+                for i, landmark_list in enumerate(extract_landmarks(model, solution.process(rgb_frame))[:detections]):
+                    landmarks_to_array(landmark_list, out=landmarks[i])
+                    present[i] = True
+                frames[model].append(landmarks)
+                presence[model].append(present)
+
+            if recorder is not None:
+                recorded = {model: frames[model][-1][presence[model][-1]] for model in models}
+                pose = recorded.get("pose")
+                face = recorded.get("face_mesh")
+                recorder.record(timestamp, pose=pose[0] if pose is not None and len(pose) else None,
+                                hands=recorded.get("hands"), face=face[0] if face is not None and len(face) else None)
+
+            if pipeline == "pose":
+                if presence["pose"][-1][0]:
+                    rep_counter.update(frames["pose"][-1][0])
+                curls.append(rep_counter.counts[0].copy())
+
+            if recorder is not None:
+                # Recorded frames are already on disk, so only the latest one is kept
+                for model in models:
+                    del frames[model][:-1], presence[model][:-1]
+    finally:
+        for solution in models.values():
+            solution.close()
+        if recorder is not None:
+            recorder.close()
+    seconds = time.perf_counter() - start
+
+    if recorder is not None:
+        return name, len(timestamps), seconds
+
+    arrays = {"timestamps": np.asarray(timestamps, dtype=np.float64)}
+    for model in models:
+        arrays[model] = np.asarray(frames[model], dtype=np.float32).reshape(
+            (len(timestamps), max_detections(model, settings), NUM_LANDMARKS[model], LANDMARK_FIELDS))
+        arrays[f"{model}_present"] = np.asarray(presence[model], dtype=bool).reshape((len(timestamps), -1))
+    if pipeline == "pose":
+        arrays["curl_counts"] = np.asarray(curls, dtype=np.int32).reshape((len(timestamps), 2))
+    np.savez(output_path, **arrays)
+
+    return name, len(timestamps), seconds
+
+
+def unique_output_paths(sources, output_dir, extension):
+    paths = []
+    used = set()
+    for name, kind, source_paths in sources:
+        candidate = name
+        suffix = 1
+        while candidate in used:
+            suffix += 1
+            candidate = f"{name}_{suffix}"
+        used.add(candidate)
+        paths.append(os.path.join(output_dir, f"{candidate}.{extension}"))
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a tracker pipeline headlessly over videos and image folders.")
+    parser.add_argument("inputs", nargs="+", help="Video files, image files, globs or directories")
+    parser.add_argument("--pipeline", choices=sorted(PIPELINES), default="pose",
+                        help="pose (curl counting), face_mesh, or body (pose + hands)")
+    parser.add_argument("--output-dir", default="landmarks", help="Directory for the per-source landmark files")
+    parser.add_argument("--format", choices=("npz", "lmk"), default="npz",
+                        help="npz arrays, or lmk landmark recordings for memory-mapped replay")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of worker processes")
+    args = parser.parse_args()
+
+    sources = collect_sources(args.inputs)
+    if not sources:
+        print("Error: No input videos or images found.")
+        return 1
+    os.makedirs(args.output_dir, exist_ok=True)
+    output_paths = unique_output_paths(sources, args.output_dir, args.format)
+
+    total_frames = 0
+    start = time.perf_counter()
+    workers = max(1, min(args.workers, len(sources)))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = [
+            executor.submit(process_source, args.pipeline, name, kind, paths, output_path)
+            for (name, kind, paths), output_path in zip(sources, output_paths)
+        ]
+        for future in as_completed(futures):
+            try:
+                name, frame_count, seconds = future.result()
+            except Exception as e:
+                print(f"Error: {e}")
+                continue
+            total_frames += frame_count
+            fps = frame_count / seconds if seconds > 0 else 0.0
+            print(f"{name}: {frame_count} frames in {seconds:.1f}s ({fps:.1f} FPS)")
+
+    elapsed = time.perf_counter() - start
+    fps = total_frames / elapsed if elapsed > 0 else 0.0
+    print(f"Processed {total_frames} frames from {len(sources)} sources in {elapsed:.1f}s "
+          f"({fps:.1f} FPS with {workers} workers)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
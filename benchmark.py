@@ -0,0 +1,240 @@
+# benchmark.py
+#
+# Time the tracker pipelines on synthetic frames or recorded clips, without a camera or display.
+#
+#   python benchmark.py --pipelines pose body --source synthetic clips/curls.mp4 --model-complexity 0 1 2
+#   python benchmark.py --baseline benchmark-before.json --output benchmark-after.json
+
+import argparse
+import importlib
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+# Tracker module holding each pipeline's processing core, and the models it runs
+TRACKERS = {
+    "pose": ("pose_tracker", ("pose",)),
+    "face_mesh": ("face_tracker", ("face_mesh",)),
+    "body": ("body_tracker", ("pose", "hands")),
+}
+
+DEFAULT_COMPLEXITY = 1
+
+
+def peak_rss_mb(who="self"):
+    """Peak resident set size of this process ("self") or its finished children, in MB (None if unsupported)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who == "self" else resource.RUSAGE_CHILDREN)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return usage.ru_maxrss / 2 ** 20 if sys.platform == "darwin" else usage.ru_maxrss / 1024
+
+
+def open_source(source, frame_count, width, height):
+    from capture import SyntheticSource, VideoFileSource
+
+    if source == "synthetic":
+        return SyntheticSource(width, height, frames=frame_count)
+    # Short clips loop so that every configuration sees the same number of frames
+    return VideoFileSource(source, loop=True)
+
+
+def run_benchmark(config, frame_count, warmup, width, height):
+    """Run one pipeline configuration in this process and return its measurements.
+
+    Meant to run in a fresh process per configuration, so that peak RSS and the models
+    loaded belong to that configuration alone.
+    """
+    from frame_scheduler import ResultCache
+    from inference_pool import InferencePool
+    from model_pool import get_model
+
+    module_name, models = TRACKERS[config["pipeline"]]
+    tracker = importlib.import_module(module_name)
+    settings = {}
+    if config["model_complexity"] is not None and "pose" in models:
+        settings["pose"] = {"model_complexity": config["model_complexity"]}
+
+    tracker.set_inference_size(config["inference_size"])
+    tracker.set_result_cache(ResultCache() if config["result_cache"] else None)
+    if config["pipeline"] != "pose":
+        tracker.set_target_fps(config["target_fps"])
+    inference_pool = None
+    if config["backend"] == "process":
+        inference_pool = InferencePool({model: settings.get(model, {}) for model in models})
+    else:
+        for model in models:
+            setattr(tracker, model, get_model(model, module_name, **settings.get(model, {})))
+    tracker.reset_state()
+
+    capture = open_source(config["source"], warmup + frame_count, width, height)
+    if not capture.isOpened():
+        raise RuntimeError(f"Could not open source {config['source']}")
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+
+    latencies = []
+    frame = rgb_frame = None
+    start = time.perf_counter()
+    try:
+        for index in range(warmup + frame_count):
+            ret, frame = capture.read(frame)
+            if not ret:
+                break
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=rgb_frame)
+            if index == warmup:
+                # Stage histograms only cover the measured frames
+                tracker.metrics.reset()
+                start = time.perf_counter()
+
+            timer = tracker.metrics.timer()
+            frame_start = time.perf_counter()
+            tracker.process_frame(frame, rgb_frame, index / fps, timer, inference_pool)
+            if index >= warmup:
+                latencies.append(time.perf_counter() - frame_start)
+        wall_seconds = time.perf_counter() - start
+    finally:
+        capture.release()
+        if inference_pool is not None:
+            inference_pool.close()
+
+    latencies = np.asarray(latencies) * 1000
+    if not len(latencies):
+        raise RuntimeError(f"No frames read from {config['source']}")
+    processing_seconds = latencies.sum() / 1000
+    p50, p95, p99 = np.percentile(latencies, (50, 95, 99))
+    return dict(
+        config,
+        frames=len(latencies),
+        wall_seconds=wall_seconds,
+        processing_seconds=processing_seconds,
+        fps=len(latencies) / processing_seconds,
+        latency_ms=dict(mean=latencies.mean(), p50=p50, p95=p95, p99=p99, max=latencies.max()),
+        # Per-stage figures come from the metrics histograms, so quantiles are bucket upper bounds
+        stages_ms={stage: dict(mean=histogram.mean() * 1000, p95=histogram.quantile(0.95) * 1000)
+                   for stage, histogram in tracker.metrics.stages.items()},
+        counters=dict(tracker.metrics.counters),
+        peak_rss_mb=peak_rss_mb("self"),
+        workers_peak_rss_mb=peak_rss_mb("children") if inference_pool is not None else None,
+    )
+
+
+def build_configs(args):
+    configs = []
+    for pipeline, source, backend, size, complexity in itertools.product(
+            args.pipelines, args.source, args.backend, args.inference_size, args.model_complexity):
+        uses_pose = "pose" in TRACKERS[pipeline][1]
+        config = dict(pipeline=pipeline, source=source, backend=backend, inference_size=size,
+                      model_complexity=complexity if uses_pose else None,
+                      target_fps=args.target_fps if pipeline != "pose" else None,
+                      result_cache=args.result_cache)
+        if config not in configs:
+            configs.append(config)
+    return configs
+
+
+def config_key(result):
+    # Results saved before the result_cache option existed ran without it
+    return tuple(result.get(name) for name in
+                 ("pipeline", "source", "backend", "inference_size", "model_complexity", "target_fps")
+                 ) + (bool(result.get("result_cache")),)
+
+
+def describe(result):
+    parts = [result["pipeline"], result["backend"], f"size={result['inference_size'] or 'full'}"]
+    if result.get("model_complexity") is not None:
+        parts.append(f"complexity={result['model_complexity']}")
+    if result.get("target_fps"):
+        parts.append(f"target_fps={result['target_fps']}")
+    if result.get("result_cache"):
+        parts.append("result_cache")
+    parts.append(os.path.basename(result["source"]))
+    return " ".join(parts)
+
+
+def environment():
+    """Library versions and machine details stored with the results, so runs can be compared."""
+    from importlib.metadata import PackageNotFoundError, version
+
+    packages = {}
+    for package in ("mediapipe", "opencv-python", "numpy"):
+        try:
+            packages[package] = version(package)
+        except PackageNotFoundError:
+            packages[package] = None
+    return dict(python=platform.python_version(), platform=platform.platform(), machine=platform.machine(),
+                cpu_count=os.cpu_count(), opencv=cv2.__version__, packages=packages)
+
+
+def parse_size(value):
+    return None if value == "full" else int(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the tracker pipelines on synthetic frames or recorded clips.")
+    parser.add_argument("--pipelines", nargs="+", choices=sorted(TRACKERS), default=sorted(TRACKERS))
+    parser.add_argument("--source", nargs="+", default=["synthetic"],
+                        help='"synthetic" for generated frames, or video files (looped to fill --frames)')
+    parser.add_argument("--frames", type=int, default=300, help="Measured frames per configuration")
+    parser.add_argument("--warmup", type=int, default=10, help="Frames run before measuring")
+    parser.add_argument("--backend", nargs="+", choices=("thread", "process"), default=["thread"])
+    parser.add_argument("--inference-size", nargs="+", type=parse_size, default=[640],
+                        help='Longest side of the model input in pixels, or "full"')
+    parser.add_argument("--model-complexity", nargs="+", type=int, choices=(0, 1, 2), default=[DEFAULT_COMPLEXITY],
+                        help="Pose model complexity (pose and body pipelines)")
+    parser.add_argument("--target-fps", type=float, default=None,
+                        help="Let face_mesh and body skip inference to hold this rate (default: infer every frame)")
+    parser.add_argument("--result-cache", action="store_true",
+                        help="Let trackers reuse results on unchanged frames (default: infer every frame)")
+    parser.add_argument("--width", type=int, default=640, help="Synthetic frame width")
+    parser.add_argument("--height", type=int, default=480, help="Synthetic frame height")
+    parser.add_argument("--output", default=f"benchmark-{time.strftime('%Y%m%d-%H%M%S')}.json",
+                        help="JSON file for the results")
+    parser.add_argument("--baseline", help="Earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for config in build_configs(args):
+        # A fresh process per configuration keeps peak RSS and loaded models separate
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            try:
+                result = executor.submit(run_benchmark, config, args.frames, args.warmup, args.width,
+                                         args.height).result()
+            except Exception as e:
+                print(f"Error: {describe(config)}: {e}")
+                continue
+        results.append(result)
+        latency = result["latency_ms"]
+        print(f"{describe(result)}: {result['fps']:.1f} FPS, p50 {latency['p50']:.1f}ms "
+              f"p95 {latency['p95']:.1f}ms p99 {latency['p99']:.1f}ms, peak RSS {result['peak_rss_mb'] or 0:.0f} MB")
+
+    with open(args.output, "w") as f:
+        json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "environment": environment(),
+                   "frames": args.frames, "warmup": args.warmup, "results": results}, f, indent=2, default=float)
+    print(f"Saved {len(results)} results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {config_key(result): result for result in json.load(f)["results"]}
+        for result in results:
+            before = baseline.get(config_key(result))
+            if before is None:
+                continue
+            fps_change = (result["fps"] / before["fps"] - 1) * 100
+            print(f"{describe(result)}: {before['fps']:.1f} -> {result['fps']:.1f} FPS ({fps_change:+.0f}%), "
+                  f"p95 {before['latency_ms']['p95']:.1f} -> {result['latency_ms']['p95']:.1f}ms")
+    return 0 if results else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
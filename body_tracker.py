@@ -1,114 +1,224 @@
-import cv2
-import mediapipe as mp
-
-# Initialize MediaPipe Pose and Hands models
-mp_pose = mp.solutions.pose
-pose = mp_pose.Pose(static_image_mode=False, model_complexity=1, min_detection_confidence=0.5, min_tracking_confidence=0.5)
-
-mp_hands = mp.solutions.hands
-hands = mp_hands.Hands(static_image_mode=False, max_num_hands=2, min_detection_confidence=0.5, min_tracking_confidence=0.5)
-
-mp_drawing = mp.solutions.drawing_utils
+import threading
+import time
+
+import numpy as np
+
+from frame_bus import get_frame_bus
+from frame_scheduler import AdaptiveScheduler, OneEuroFilter, ResultCache
+from inference_pool import InferencePool
+from kinematics import PoseLandmark, pose_to_array
+from landmark_arrays import LandmarkResults, results_to_array
+from metrics import get_tracker_metrics
+from model_pool import get_model
+from output_sinks import NullSink
+from renderer import OverlayBuffer, body_pose_renderer, hands_renderer
+from roi import RoiPreprocessor
+
+# Pose and Hands models from the shared pool, loaded on the first frame; the pose model is
+# the same one pose_tracker uses
+pose = get_model("pose", __name__)
+hands = get_model("hands", __name__)
 
 # Global variables
-tracking = False
-secondary_frame_callback = None  # Callback for sending a secondary frame
+run_lock = threading.Lock()  # Held while a tracking loop runs; the module state supports one loop at a time
+stop_requested = threading.Event()  # Stops the loop started by start_body_tracking
+secondary_frame_callback = None  # Callback for sending a secondary frame (reused, copy it to keep it)
+inference_backend = "thread"  # "thread" runs the models in-process, "process" in worker processes
+landmark_recorder = None  # Optional LandmarkRecorder for saving landmarks
+landmark_stream = None  # Optional LandmarkStreamServer for downstream consumers
+pose_roi = RoiPreprocessor()  # Downscales the frame before pose inference
+hands_roi = RoiPreprocessor(padding=0.5)  # Crops around the wrists and hands before hand inference
+scheduler = AdaptiveScheduler()  # Skips inference on some frames when the models can't keep up
+pose_filter = OneEuroFilter()  # Smooth landmarks and predict them on skipped frames
+hands_filter = OneEuroFilter()
+result_cache = ResultCache()  # Skips inference while the scene is unchanged
+output_sink = NullSink()  # Receives the annotated frames; headless until set_output_sink
+overlay_buffer = OverlayBuffer()  # Landmarks-only drawing target, reused every frame
+metrics = get_tracker_metrics("body")  # Per-stage latency histograms and counters
+
+# Pose landmarks from the wrists to the fingertips, used to locate the hands
+HAND_POSE_LANDMARKS = list(range(PoseLandmark.LEFT_WRIST, PoseLandmark.RIGHT_THUMB + 1))
 
 def set_secondary_frame_callback(callback):
     """Set a callback function to send secondary frames."""
     global secondary_frame_callback
     secondary_frame_callback = callback
 
-def track_body_and_hands():
-    global tracking
-    cap = cv2.VideoCapture(0)
-
-    if not cap.isOpened():
+def set_inference_backend(backend):
+    """Select "thread" to run models in-process or "process" for one worker process per model."""
+    global inference_backend
+    if backend not in ("thread", "process"):
+        raise ValueError(f"Unknown inference backend: {backend}")
+    inference_backend = backend
+
+def set_landmark_recorder(recorder):
+    """Set a LandmarkRecorder that receives every frame's landmarks (None to stop recording)."""
+    global landmark_recorder
+    landmark_recorder = recorder
+
+def set_landmark_stream(stream):
+    """Set a LandmarkStreamServer that receives every frame's landmarks (None to stop streaming)."""
+    global landmark_stream
+    landmark_stream = stream
+
+def set_output_sink(sink):
+    """Set where annotated frames go: a DisplayMultiplexer, VideoWriterSink, NullSink, etc."""
+    global output_sink
+    output_sink = sink
+
+def set_result_cache(cache):
+    """Set a ResultCache that reuses results while the scene is unchanged (None to always infer)."""
+    global result_cache
+    result_cache = cache
+
+def set_inference_size(size):
+    """Set the longest side, in pixels, of the image handed to the model (None for full size)."""
+    pose_roi.inference_size = size
+    hands_roi.inference_size = size
+
+def set_target_fps(fps):
+    """Frame rate the tracker tries to hold by skipping inference on some frames (None to disable)."""
+    scheduler.target_fps = fps
+
+def reset_state():
+    """Forget the inference timing, landmark history and hand region before a new session."""
+    scheduler.reset()
+    pose_filter.reset()
+    hands_filter.reset()
+    if result_cache is not None:
+        result_cache.reset()
+    hands_roi.track([])
+
+def process_frame(frame, rgb_frame, timestamp, timer, inference_pool=None):
+    """Run the pose and hands pipeline on one frame, drawing the landmarks onto `frame`.
+
+    This is the camera-independent core of the tracker; returns the frame's LandmarkResults.
+    The landmarks-only overlay is left in overlay_buffer.overlay.
+    """
+    if scheduler.should_infer():
+        measured = result_cache.lookup(rgb_frame, timestamp) if result_cache is not None else None
+        if measured is not None:
+            metrics.count("cached_inference")
+        else:
+            # Process Pose and Hands; the pose sees the whole (downscaled) frame
+            start = time.perf_counter()
+            pose_image, _ = pose_roi.prepare(rgb_frame)
+            if inference_pool is not None:
+                # Both models run concurrently in their own worker processes
+                pose_results = hands_results = inference_pool.process(pose_image)
+            else:
+                pose_results = pose.process(pose_image)
+
+                # Crop the hands around the pose's wrists, or around last frame's hands
+                pose_array = pose_to_array(pose_results)
+                if pose_array is not None:
+                    hands_roi.track([pose_array[HAND_POSE_LANDMARKS]])
+                hands_image, transform = hands_roi.prepare(rgb_frame)
+                hands_results = transform.restore_results(hands.process(hands_image))
+            scheduler.record_inference(time.perf_counter() - start)
+            measured = (np.array(results_to_array("pose", pose_results)),
+                        np.array(results_to_array("hands", hands_results)))
+            if result_cache is not None:
+                result_cache.store(measured, timestamp)
+
+        poses = pose_filter(measured[0], timestamp)
+        hand_arrays = hands_filter(measured[1], timestamp)
+        hands_roi.track(list(hand_arrays))
+        timer.lap("inference")
+    else:
+        # Skipped frame: extrapolate the landmarks from the filters
+        poses = pose_filter.predict(timestamp)
+        hand_arrays = hands_filter.predict(timestamp)
+        metrics.count("skipped_inference")
+        timer.lap("prediction")
+    pose_results = hands_results = LandmarkResults({"pose": poses, "hands": hand_arrays})
+
+    if landmark_recorder is not None:
+        landmark_recorder.record_results(timestamp, pose_results=pose_results, hands_results=hands_results)
+        timer.lap("record")
+
+    if landmark_stream is not None:
+        landmark_stream.publish("body", timestamp, {"pose": poses, "hands": hand_arrays})
+        timer.lap("stream")
+
+    # Draw pose and hands once into the overlay, which doubles as the secondary frame
+    overlay = overlay_buffer.clear(frame.shape)
+    body_pose_renderer.draw(overlay, poses)
+    hands_renderer.draw(overlay, hand_arrays)
+    overlay_buffer.composite(frame)
+    timer.lap("render")
+    return pose_results
+
+def track_body_and_hands(stop_event, on_result=None):
+    """Run the camera loop on this thread until stop_event is set (or the output sink asks it to stop).
+
+    on_result(timestamp, frame, results) is called from this thread after every frame, with
+    the annotated frame and process_frame's results; both are reused, so copy them to keep them.
+    """
+    subscriber = get_frame_bus().subscribe()
+
+    if not subscriber.is_opened():
+        subscriber.close()
         print("Error: Camera not accessible.")
         return
 
+    inference_pool = InferencePool({"pose": {}, "hands": {}}) if inference_backend == "process" else None
+    reset_state()
+
     try:
-        while tracking:
-            ret, frame = cap.read()
+        while not stop_event.is_set():
+            timer = metrics.timer()
+
+            # Shared camera frame, already converted to RGB by the frame bus
+            ret, frame, rgb_frame = subscriber.read()
+            if ret is None:
+                continue  # No frame yet; check for a stop request and keep waiting
             if not ret:
+                metrics.count("errors")
                 print("Error: Failed to read frame from camera.")
                 break
+            metrics.count("frames")
+            metrics.set_count("dropped_frames", subscriber.dropped_frames)
+            timer.lap("capture")
 
-            # Convert image color to RGB
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-            # Process Pose and Hands
-            pose_results = pose.process(rgb_frame)
-            hands_results = hands.process(rgb_frame)
-
-            # Create a blank black image for secondary display
-            blank_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            blank_frame[:] = 0
-            blank_frame = cv2.cvtColor(blank_frame, cv2.COLOR_GRAY2BGR)
-
-            # Draw pose landmarks on the primary frame (camera feed)
-            if pose_results.pose_landmarks:
-                mp_drawing.draw_landmarks(
-                    image=frame,
-                    landmark_list=pose_results.pose_landmarks,
-                    connections=mp_pose.POSE_CONNECTIONS,
-                    landmark_drawing_spec=mp_drawing.DrawingSpec(color=(255, 255, 0), thickness=2, circle_radius=2),
-                    connection_drawing_spec=mp_drawing.DrawingSpec(color=(0, 255, 0), thickness=2, circle_radius=2)
-                )
-
-                # Draw pose landmarks on the blank frame (secondary display)
-                mp_drawing.draw_landmarks(
-                    image=blank_frame,
-                    landmark_list=pose_results.pose_landmarks,
-                    connections=mp_pose.POSE_CONNECTIONS,
-                    landmark_drawing_spec=mp_drawing.DrawingSpec(color=(255, 255, 0), thickness=2, circle_radius=2),
-                    connection_drawing_spec=mp_drawing.DrawingSpec(color=(0, 255, 0), thickness=2, circle_radius=2)
-                )
-
-            # Draw hand landmarks on both frames
-            if hands_results.multi_hand_landmarks:
-                for hand_landmarks in hands_results.multi_hand_landmarks:
-                    mp_drawing.draw_landmarks(
-                        image=frame,
-                        landmark_list=hand_landmarks,
-                        connections=mp_hands.HAND_CONNECTIONS,
-                        landmark_drawing_spec=mp_drawing.DrawingSpec(color=(255, 0, 255), thickness=2, circle_radius=2),
-                        connection_drawing_spec=mp_drawing.DrawingSpec(color=(255, 255, 255), thickness=2, circle_radius=2)
-                    )
-
-                    mp_drawing.draw_landmarks(
-                        image=blank_frame,
-                        landmark_list=hand_landmarks,
-                        connections=mp_hands.HAND_CONNECTIONS,
-                        landmark_drawing_spec=mp_drawing.DrawingSpec(color=(255, 0, 255), thickness=2, circle_radius=2),
-                        connection_drawing_spec=mp_drawing.DrawingSpec(color=(255, 255, 255), thickness=2, circle_radius=2)
-                    )
+            results = process_frame(frame, rgb_frame, subscriber.timestamp, timer, inference_pool)
 
             # Send secondary frame to the external display
             if secondary_frame_callback:
-                secondary_frame_callback(blank_frame)
+                secondary_frame_callback(overlay_buffer.overlay)
+            if on_result is not None:
+                on_result(subscriber.timestamp, frame, results)
+            if secondary_frame_callback or on_result is not None:
+                timer.lap("callback")
 
             # Show the primary frame
-            cv2.imshow("Whole-Body and Hands Tracker - Camera View", frame)
-
-            if cv2.waitKey(1) & 0xFF == ord('q'):  # Press 'q' to quit
+            keep_running = output_sink.show("Whole-Body and Hands Tracker - Camera View", frame, subscriber.timestamp)
+            timer.lap("output")
+            metrics.observe("end_to_end", time.monotonic() - subscriber.timestamp)
+            if not keep_running:  # 'q' pressed in the display
                 break
 
     except Exception as e:
+        metrics.count("errors")
         print(f"Error: {e}")
 
     finally:
-        cap.release()
-        cv2.destroyAllWindows()
+        subscriber.close()
+        if inference_pool is not None:
+            inference_pool.close()
+        output_sink.remove("Whole-Body and Hands Tracker - Camera View")
 
 def start_body_tracking():
-    global tracking
-    if not tracking:
-        tracking = True
+    """Run whole-body tracking on this thread until stopped; does nothing if it is already running."""
+    if not run_lock.acquire(blocking=False):
+        return
+    try:
+        stop_requested.clear()
         print("Starting whole-body and hands tracking...")
-        track_body_and_hands()
+        track_body_and_hands(stop_requested)
+    finally:
+        run_lock.release()
 
 def stop_body_tracking():
-    global tracking
-    tracking = False
+    stop_requested.set()
     print("Stopping whole-body and hands tracking...")
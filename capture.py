@@ -0,0 +1,194 @@
+import os
+import time
+
+import cv2
+import numpy as np
+
+# Camera defaults: a one-frame driver queue, so a read never returns a stale buffered frame
+DEFAULT_BUFFER_SIZE = 1
+
+
+class FramePacer:
+    """Sleep between reads to hold a frame rate, as a live camera would."""
+
+    def __init__(self, fps):
+        self.fps = fps
+        self.next_frame_time = None
+
+    def wait(self):
+        now = time.monotonic()
+        if self.next_frame_time is None or now - self.next_frame_time > 1.0:
+            self.next_frame_time = now  # First frame, or far behind: don't try to catch up
+        elif self.next_frame_time > now:
+            time.sleep(self.next_frame_time - now)
+        self.next_frame_time += 1.0 / self.fps
+
+
+class SyntheticSource:
+    """Capture stand-in that generates a deterministic frame sequence, for runs without a camera.
+
+    Frames are a fixed noise background with a bright block sweeping across it. Nothing in them
+    looks like a person, so the models only run their detectors; use a recorded clip to time
+    the tracking path. With `realtime` frames arrive at `fps` like a camera's.
+    """
+
+    def __init__(self, width=640, height=480, frames=300, fps=30.0, seed=0, realtime=False):
+        self.width = width
+        self.height = height
+        self.frames = frames
+        self.fps = fps
+        self.background = np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8)
+        self.pacer = FramePacer(fps) if realtime else None
+        self.index = 0
+        self.opened = True
+
+    def isOpened(self):
+        return self.opened
+
+    def grab(self):
+        if not self.opened or (self.frames is not None and self.index >= self.frames):
+            return False
+        if self.pacer is not None:
+            self.pacer.wait()
+        self.index += 1
+        return True
+
+    def retrieve(self, image=None):
+        if image is None or image.shape != self.background.shape:
+            image = np.empty_like(self.background)
+        np.copyto(image, self.background)
+
+        size = min(self.width, self.height) // 4
+        x = ((self.index - 1) * 8) % max(self.width - size, 1)
+        y = (self.height - size) // 2
+        image[y:y + size, x:x + size] = 255
+        return True, image
+
+    def read(self, image=None):
+        if not self.grab():
+            return False, None
+        return self.retrieve(image)
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self.fps)
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self.frames or 0)
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.index)
+        return 0.0
+
+    def release(self):
+        self.opened = False
+
+
+class VideoFileSource:
+    """Play a video file through the cv2.VideoCapture interface, optionally looping and at its own frame rate.
+
+    With `realtime` the reads are paced to the file's FPS, so a clip stands in for a live
+    camera on the frame bus; without it frames are returned as fast as they decode.
+    `hw_acceleration` asks the FFmpeg backend for hardware decoding where available.
+    """
+
+    def __init__(self, path, loop=False, realtime=False, hw_acceleration=False):
+        self.path = path
+        self.loop = loop
+        if hw_acceleration:
+            self.cap = cv2.VideoCapture(path, cv2.CAP_ANY, [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY])
+        else:
+            self.cap = cv2.VideoCapture(path)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.pacer = FramePacer(self.fps) if realtime else None
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def grab(self):
+        ret = self.cap.grab()
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret = self.cap.grab()
+        if ret and self.pacer is not None:
+            self.pacer.wait()
+        return ret
+
+    def retrieve(self, image=None):
+        return self.cap.retrieve(image)
+
+    def read(self, image=None):
+        if not self.grab():
+            return False, None
+        return self.retrieve(image)
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def release(self):
+        self.cap.release()
+
+
+def decode_fourcc(value):
+    value = int(value)
+    return "".join(chr((value >> 8 * i) & 0xFF) for i in range(4))
+
+
+def open_camera(index=0, width=None, height=None, fps=None, fourcc=None, buffer_size=DEFAULT_BUFFER_SIZE,
+                api=cv2.CAP_ANY):
+    """Open a camera with an explicit format instead of whatever the driver picks.
+
+    fourcc is a pixel format such as "MJPG" (compressed, usually needed for high resolutions
+    and frame rates over USB) or "YUYV". Settings the camera can't honor keep the driver's
+    value, with a warning.
+    """
+    cap = cv2.VideoCapture(index, api)
+    if not cap.isOpened():
+        return cap
+
+    # The pixel format goes first: some drivers only offer the larger modes in MJPG
+    if fourcc:
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+    if width:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    if height:
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    if fps:
+        cap.set(cv2.CAP_PROP_FPS, fps)
+    if buffer_size is not None:
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, buffer_size)
+
+    requested = {"width": (width, cv2.CAP_PROP_FRAME_WIDTH), "height": (height, cv2.CAP_PROP_FRAME_HEIGHT),
+                 "fps": (fps, cv2.CAP_PROP_FPS)}
+    for name, (value, prop) in requested.items():
+        actual = cap.get(prop)
+        if value and abs(actual - value) > 0.5:
+            print(f"Warning: Camera {index} is using {name} {actual:g} instead of {value}")
+    if fourcc and decode_fourcc(cap.get(cv2.CAP_PROP_FOURCC)) != fourcc:
+        print(f"Warning: Camera {index} is using format {decode_fourcc(cap.get(cv2.CAP_PROP_FOURCC))!r} "
+              f"instead of {fourcc!r}")
+    return cap
+
+
+def open_capture(source, **settings):
+    """Open a frame source: a camera index, a video file path, "synthetic", or a callable returning a capture.
+
+    Settings are the open_camera arguments; video files and "synthetic" play back in real time
+    so they can stand in for a camera (files also accept hw_acceleration). Anything returned has
+    the cv2.VideoCapture reading interface (isOpened, grab, retrieve, read, get, release).
+    """
+    if callable(source):
+        return source()
+    if source == "synthetic":
+        return SyntheticSource(settings.get("width") or 640, settings.get("height") or 480, frames=None,
+                               fps=settings.get("fps") or 30.0, realtime=True)
+    if isinstance(source, str) and os.path.isfile(source):
+        return VideoFileSource(source, realtime=True, hw_acceleration=settings.get("hw_acceleration", False))
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    if isinstance(source, int):
+        settings.pop("hw_acceleration", None)
+        return open_camera(source, **settings)
+    return cv2.VideoCapture(source)  # Stream URLs and device paths
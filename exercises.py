@@ -0,0 +1,108 @@
+from collections import namedtuple
+
+import numpy as np
+
+from kinematics import JointAngles
+
+# An exercise is a joint-angle rule with hysteresis. The angle (averaged over `joints`) starts
+# beyond `start`; crossing `end` counts a rep and crossing back over `start` re-arms the rule.
+# `label`, `part` and `cue` are used for the on-screen counters and feedback.
+Exercise = namedtuple("Exercise", "name joints start end label part cue")
+
+EXERCISES = {
+    "right_curl": Exercise("right_curl", ("right_elbow",), 160, 45, "Right Curls", "Right Arm", "Nice Curl!"),
+    "left_curl": Exercise("left_curl", ("left_elbow",), 160, 45, "Left Curls", "Left Arm", "Nice Curl!"),
+    "squat": Exercise("squat", ("left_knee", "right_knee"), 160, 90, "Squats", "Legs", "Nice Squat!"),
+    "shoulder_press": Exercise("shoulder_press", ("left_elbow", "right_elbow"), 90, 160, "Presses", "Arms", "Nice Press!"),
+    "lateral_raise": Exercise("lateral_raise", ("left_shoulder", "right_shoulder"), 30, 80, "Lateral Raises", "Arms", "Nice Raise!"),
+    "deadlift": Exercise("deadlift", ("left_hip", "right_hip"), 100, 165, "Deadlifts", "Hips", "Nice Lift!"),
+}
+
+CURLS = ("right_curl", "left_curl")
+
+
+class RepCounter:
+    """Rep counting state for a set of exercises and one or more tracked people.
+
+    Per-track state lives in (tracks, exercises) arrays, so every active exercise is evaluated
+    in one vectorized step per frame no matter how many are configured.
+    """
+
+    def __init__(self, exercises=CURLS, max_tracks=1):
+        self.exercises = [EXERCISES[name] if isinstance(name, str) else name for name in exercises]
+        joints = sorted({joint for exercise in self.exercises for joint in exercise.joints})
+        self.joint_angles = JointAngles(joints)
+
+        # Averaging matrix mapping joint angles to one angle per exercise
+        self.weights = np.zeros((len(self.exercises), len(joints)), dtype=np.float32)
+        for row, exercise in enumerate(self.exercises):
+            for joint in exercise.joints:
+                self.weights[row, joints.index(joint)] = 1.0 / len(exercise.joints)
+
+        # Flip the sign of exercises that count on a decreasing angle so one comparison fits all
+        start = np.array([exercise.start for exercise in self.exercises], dtype=np.float32)
+        end = np.array([exercise.end for exercise in self.exercises], dtype=np.float32)
+        self.sign = np.where(end > start, 1.0, -1.0).astype(np.float32)
+        self.start = start * self.sign
+        self.end = end * self.sign
+
+        self.up = np.zeros((max_tracks, len(self.exercises)), dtype=bool)
+        self.counts = np.zeros((max_tracks, len(self.exercises)), dtype=np.int32)
+
+    def reset(self, tracks=slice(None)):
+        self.up[tracks] = False
+        self.counts[tracks] = 0
+
+    def index(self, name):
+        return [exercise.name for exercise in self.exercises].index(name)
+
+    def exercise_angles(self, landmarks):
+        """Angle driving each exercise for (..., 33, 4) landmarks, shaped (..., exercises)."""
+        return self.joint_angles(landmarks) @ self.weights.T
+
+    def update(self, landmarks, tracks=0):
+        """Advance the state of every exercise from one frame of pose landmarks.
+
+        `landmarks` is (33, 4) for a single track, or (K, 33, 4) together with K track indices.
+        Returns the number of reps completed on this frame, shaped like the selected state.
+        """
+        value = self.exercise_angles(landmarks) * self.sign
+        up = self.up[tracks]
+        entered = ~up & (value > self.end)
+        left = up & (value < self.start)
+        self.counts[tracks] += entered
+        self.up[tracks] = (up | entered) & ~left
+        return entered.astype(np.int32)
+
+    def count_batch(self, landmarks, track=0):
+        """Run the rule over a whole (N, 33, 4) sequence for one track in a single pass.
+
+        The hysteresis is resolved by forward-filling the last frame that crossed a threshold,
+        so no Python loop runs per frame. The track's state carries over between calls, which
+        allows long recordings to be processed in chunks. Returns the (N, exercises) up/down
+        state and the running rep counts.
+        """
+        return self.count_angles(self.exercise_angles(landmarks), track)
+
+    def count_angles(self, angles, track=0):
+        """count_batch on precomputed (N, exercises) angles from exercise_angles."""
+        value = angles * self.sign
+        frames = value.shape[0]
+
+        # 1 where a frame reaches the end position, 0 where it returns to the start, -1 otherwise
+        crossing = np.full(value.shape, -1, dtype=np.int8)
+        crossing[value < self.start] = 0
+        crossing[value > self.end] = 1
+
+        # Row 0 holds the state carried over from the previous call
+        crossing = np.concatenate([self.up[track][None].astype(np.int8), crossing])
+        rows = np.where(crossing >= 0, np.arange(frames + 1)[:, None], 0)
+        np.maximum.accumulate(rows, axis=0, out=rows)
+        state = np.take_along_axis(crossing, rows, axis=0).astype(bool)
+
+        reps = np.cumsum(state[1:] & ~state[:-1], axis=0, dtype=np.int32)
+        counts = self.counts[track] + reps
+        if frames:
+            self.up[track] = state[-1]
+            self.counts[track] = counts[-1]
+        return state[1:], counts
@@ -1,16 +1,38 @@
-import cv2
-import mediapipe as mp
+import threading
+import time
 
-# Initialize Face Mesh model
-mp_face_mesh = mp.solutions.face_mesh
-face_mesh = mp_face_mesh.FaceMesh(static_image_mode=False, max_num_faces=1, min_detection_confidence=0.5, min_tracking_confidence=0.5)
-mp_drawing = mp.solutions.drawing_utils
-mp_drawing_styles = mp.solutions.drawing_styles
+import numpy as np
+
+from frame_bus import get_frame_bus
+from frame_scheduler import AdaptiveScheduler, OneEuroFilter, ResultCache
+from inference_pool import InferencePool
+from landmark_arrays import LandmarkResults, results_to_array
+from metrics import get_tracker_metrics
+from model_pool import get_model
+from output_sinks import DisplayMultiplexer, NullSink
+from renderer import OverlayBuffer, face_mesh_renderer
+from roi import RoiPreprocessor
+
+face_settings = {}  # Overrides of the model settings, shared with the inference pool
+
+# Face Mesh model from the shared pool, loaded on the first frame
+face_mesh = get_model("face_mesh", __name__)
 
 # Global variables
-tracking = False
+run_lock = threading.Lock()  # Held while a tracking loop runs; the module state supports one loop at a time
+stop_requested = threading.Event()  # Stops the loop started by start_face_mesh_tracking
 status_callback = None  # Callback for sending status updates
-secondary_frame_callback = None  # Callback for sending a secondary frame (e.g., landmarks only)
+secondary_frame_callback = None  # Callback for sending a secondary frame (e.g., landmarks only; reused, copy it to keep it)
+inference_backend = "thread"  # "thread" runs the model in-process, "process" in a worker process
+landmark_recorder = None  # Optional LandmarkRecorder for saving landmarks
+landmark_stream = None  # Optional LandmarkStreamServer for downstream consumers
+face_roi = RoiPreprocessor()  # Crops around the last detected face and downscales before inference
+scheduler = AdaptiveScheduler()  # Skips inference on some frames when the model can't keep up
+face_filter = OneEuroFilter()  # Smooths face landmarks and predicts them on skipped frames
+result_cache = ResultCache()  # Skips inference while the scene is unchanged
+output_sink = NullSink()  # Receives the annotated frames; headless until set_output_sink
+overlay_buffer = OverlayBuffer()  # Landmarks-only drawing target, reused every frame
+metrics = get_tracker_metrics("face_mesh")  # Per-stage latency histograms and counters
 
 def set_status_callback(callback):
     """Set a callback function to send tracking updates."""
@@ -22,92 +44,203 @@ def set_secondary_frame_callback(callback):
     global secondary_frame_callback
     secondary_frame_callback = callback
 
-def track_face():
-    global tracking
-    cap = cv2.VideoCapture(0)
+def set_inference_backend(backend):
+    """Select "thread" to run models in-process or "process" for one worker process per model."""
+    global inference_backend
+    if backend not in ("thread", "process"):
+        raise ValueError(f"Unknown inference backend: {backend}")
+    inference_backend = backend
+
+def set_landmark_recorder(recorder):
+    """Set a LandmarkRecorder that receives every frame's landmarks (None to stop recording)."""
+    global landmark_recorder
+    landmark_recorder = recorder
+
+def set_landmark_stream(stream):
+    """Set a LandmarkStreamServer that receives every frame's landmarks (None to stop streaming)."""
+    global landmark_stream
+    landmark_stream = stream
+
+def set_output_sink(sink):
+    """Set where annotated frames go: a DisplayMultiplexer, VideoWriterSink, NullSink, etc."""
+    global output_sink
+    output_sink = sink
+
+def set_result_cache(cache):
+    """Set a ResultCache that reuses results while the scene is unchanged (None to always infer)."""
+    global result_cache
+    result_cache = cache
+
+def set_inference_size(size):
+    """Set the longest side, in pixels, of the image handed to the model (None for full size)."""
+    face_roi.inference_size = size
+
+def set_target_fps(fps):
+    """Frame rate the tracker tries to hold by skipping inference on some frames (None to disable)."""
+    scheduler.target_fps = fps
+
+def set_max_faces(max_faces):
+    """Track up to this many faces (call while tracking is stopped).
+
+    With more than one face the model sees the whole frame, so new faces can enter anywhere.
+    """
+    global face_mesh
+    face_settings["max_num_faces"] = max_faces
+    face_mesh = get_model("face_mesh", __name__, **face_settings)
+
+def reset_state():
+    """Forget the inference timing, landmark history and face region before a new session."""
+    scheduler.reset()
+    face_filter.reset()
+    if result_cache is not None:
+        result_cache.reset()
+    face_roi.track([])
+
+
+def process_frame(frame, rgb_frame, timestamp, timer, inference_pool=None):
+    """Run the face mesh pipeline on one frame, drawing the mesh onto `frame`.
+
+    This is the camera-independent core of the tracker; returns the frame's LandmarkResults.
+    The landmarks-only overlay is left in overlay_buffer.overlay.
+    """
+    if scheduler.should_infer():
+        measured = result_cache.lookup(rgb_frame, timestamp) if result_cache is not None else None
+        if measured is not None:
+            metrics.count("cached_inference")
+        else:
+            # Run the model on the region around the previous face, then map back to the full frame
+            start = time.perf_counter()
+            input_image, transform = face_roi.prepare(rgb_frame)
+            if inference_pool is not None:
+                results = inference_pool.process(input_image)
+            else:
+                results = face_mesh.process(input_image)
+            transform.restore_results(results)
+            scheduler.record_inference(time.perf_counter() - start)
+            measured = np.array(results_to_array("face_mesh", results))
+            if result_cache is not None:
+                result_cache.store(measured, timestamp)
+
+        faces = face_filter(measured, timestamp)
+        face_roi.track(list(faces) if face_settings.get("max_num_faces", 1) == 1 else [])
+        timer.lap("inference")
+    else:
+        # Skipped frame: extrapolate the landmarks from the filter
+        faces = face_filter.predict(timestamp)
+        metrics.count("skipped_inference")
+        timer.lap("prediction")
+    results = LandmarkResults({"face_mesh": faces})
+
+    if landmark_recorder is not None:
+        landmark_recorder.record_results(timestamp, face_results=results)
+        timer.lap("record")
+
+    if landmark_stream is not None:
+        landmark_stream.publish("face_mesh", timestamp, {"face_mesh": faces})
+        timer.lap("stream")
+
+    # Draw the mesh once into the overlay, which doubles as the secondary frame
+    overlay = overlay_buffer.clear(frame.shape)
+    if faces is not None and len(faces):
+        face_mesh_renderer.draw(overlay, faces)
+        overlay_buffer.composite(frame)
+
+        if status_callback:
+            status_callback("Face detected and landmarks drawn.")
+    else:
+        if status_callback:
+            status_callback("No face detected.")
+    timer.lap("render")
+    return results
+
+def track_face(stop_event, on_result=None):
+    """Run the camera loop on this thread until stop_event is set (or the output sink asks it to stop).
 
-    if not cap.isOpened():
+    on_result(timestamp, frame, results) is called from this thread after every frame, with
+    the annotated frame and process_frame's results; both are reused, so copy them to keep them.
+    """
+    subscriber = get_frame_bus().subscribe()
+
+    if not subscriber.is_opened():
+        subscriber.close()
         if status_callback:
             status_callback("Error: Camera not accessible.")
         return
 
+    inference_pool = InferencePool({"face_mesh": face_settings}) if inference_backend == "process" else None
+    reset_state()
+
     try:
-        while tracking:
-            ret, frame = cap.read()
+        while not stop_event.is_set():
+            timer = metrics.timer()
+
+            # Shared camera frame, already converted to RGB by the frame bus
+            ret, frame, rgb_frame = subscriber.read()
+            if ret is None:
+                continue  # No frame yet; check for a stop request and keep waiting
             if not ret:
+                metrics.count("errors")
                 if status_callback:
                     status_callback("Error: Failed to read frame from camera.")
                 break
+            metrics.count("frames")
+            metrics.set_count("dropped_frames", subscriber.dropped_frames)
+            timer.lap("capture")
 
-            # Convert image color to RGB
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = face_mesh.process(rgb_frame)
-
-            # Create a blank black image for secondary display
-            blank_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            blank_frame[:] = 0
-            blank_frame = cv2.cvtColor(blank_frame, cv2.COLOR_GRAY2BGR)
-
-            if results.multi_face_landmarks:
-                for face_landmarks in results.multi_face_landmarks:
-                    # Draw landmarks on the primary frame (camera feed)
-                    mp_drawing.draw_landmarks(
-                        image=frame,
-                        landmark_list=face_landmarks,
-                        connections=mp_face_mesh.FACEMESH_TESSELATION,
-                        landmark_drawing_spec=None,
-                        connection_drawing_spec=mp_drawing_styles.get_default_face_mesh_tesselation_style()
-                    )
-
-                    # Draw landmarks on the blank frame (secondary display)
-                    mp_drawing.draw_landmarks(
-                        image=blank_frame,
-                        landmark_list=face_landmarks,
-                        connections=mp_face_mesh.FACEMESH_TESSELATION,
-                        landmark_drawing_spec=None,
-                        connection_drawing_spec=mp_drawing_styles.get_default_face_mesh_tesselation_style()
-                    )
-
-                if status_callback:
-                    status_callback("Face detected and landmarks drawn.")
-            else:
-                if status_callback:
-                    status_callback("No face detected.")
+            results = process_frame(frame, rgb_frame, subscriber.timestamp, timer, inference_pool)
 
             # Send secondary frame for external display
             if secondary_frame_callback:
-                secondary_frame_callback(blank_frame)
+                secondary_frame_callback(overlay_buffer.overlay)
+            if on_result is not None:
+                on_result(subscriber.timestamp, frame, results)
+            if secondary_frame_callback or on_result is not None:
+                timer.lap("callback")
 
             # Show the primary frame
-            cv2.imshow("Face Mesh Tracker - Camera View", frame)
-
-            if cv2.waitKey(1) & 0xFF == ord('q'):  # Press 'q' to quit
+            keep_running = output_sink.show("Face Mesh Tracker - Camera View", frame, subscriber.timestamp)
+            timer.lap("output")
+            metrics.observe("end_to_end", time.monotonic() - subscriber.timestamp)
+            if not keep_running:  # 'q' pressed in the display
                 break
 
     except Exception as e:
+        metrics.count("errors")
         if status_callback:
             status_callback(f"Error: {e}")
 
     finally:
-        cap.release()
-        cv2.destroyAllWindows()
+        subscriber.close()
+        if inference_pool is not None:
+            inference_pool.close()
+        output_sink.remove("Face Mesh Tracker - Camera View")
         if status_callback:
             status_callback("Tracking stopped, resources released.")
 
 def start_face_mesh_tracking():
-    global tracking
-    if not tracking:
-        tracking = True
+    """Run face mesh tracking on this thread until stopped; does nothing if it is already running."""
+    if not run_lock.acquire(blocking=False):
+        return
+    try:
+        stop_requested.clear()
         if status_callback:
             status_callback("Starting face mesh tracking...")
-        track_face()
+        track_face(stop_requested)
+    finally:
+        run_lock.release()
 
 def stop_face_mesh_tracking():
-    global tracking
-    tracking = False
+    stop_requested.set()
     if status_callback:
         status_callback("Stopping face mesh tracking...")
 
-# Example usage:
+# Example usage: track on a worker thread, since the display is drawn from the main thread
 if __name__ == "__main__":
-    start_face_mesh_tracking()
+    display = DisplayMultiplexer()
+    set_output_sink(display)
+    worker = threading.Thread(target=start_face_mesh_tracking)
+    worker.start()
+    while worker.is_alive():
+        display.pump()  # Press 'q' in the window to stop
+        time.sleep(1 / 30)
+    display.close()
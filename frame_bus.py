@@ -0,0 +1,212 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from capture import open_capture
+from metrics import get_tracker_metrics
+
+# Number of preallocated frame slots in the ring buffer
+RING_SIZE = 4
+
+metrics = get_tracker_metrics("frame_bus")
+
+
+class FrameBus:
+    """Read frames from a single camera once and publish them to any number of trackers.
+
+    `source` is anything capture.open_capture accepts: a camera index, a video file or a
+    callable returning a capture object; capture_settings (resolution, fps, fourcc,
+    buffer_size) are passed to it. Capture and decoding run on the producer thread, so they
+    stay off the trackers' inference path.
+    """
+
+    def __init__(self, source=0, ring_size=RING_SIZE, **capture_settings):
+        self.source = source
+        self.capture_settings = capture_settings
+        self.ring_size = ring_size
+        self.cap = None
+        self.producer = None
+        self.running = False
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.frame_ready = threading.Condition(self.lock)
+
+        # Ring buffer of preallocated BGR/RGB frames, allocated once the frame size is known
+        self.bgr_ring = None
+        self.rgb_ring = None
+        self.timestamps = np.zeros(ring_size, dtype=np.float64)
+        self.sequence = 0  # Sequence number of the latest published frame (0 = none yet)
+        self.failed = False
+
+    def subscribe(self, latest_only=True):
+        """Register a new consumer, starting the capture on the first subscription.
+
+        See FrameSubscriber for the latest_only policy.
+        """
+        # Let a previous producer finish releasing the camera before reopening it
+        producer = self.producer
+        if producer is not None and not self.running and producer is not threading.current_thread():
+            producer.join()
+
+        with self.lock:
+            if not self.running:
+                self._start()
+            subscriber = FrameSubscriber(self, latest_only)
+            self.subscribers.add(subscriber)
+            return subscriber
+
+    def unsubscribe(self, subscriber):
+        """Remove a consumer, releasing the camera once nobody is listening."""
+        with self.lock:
+            self.subscribers.discard(subscriber)
+            if self.subscribers or not self.running:
+                return
+            self.running = False
+            self.frame_ready.notify_all()
+            producer = self.producer
+
+        if producer is not None and producer is not threading.current_thread():
+            producer.join()
+
+    def _start(self):
+        """Open the capture source and launch the producer thread (lock must be held)."""
+        self.cap = open_capture(self.source, **self.capture_settings)
+        self.failed = not self.cap.isOpened()
+        if self.failed:
+            self.cap.release()
+            self.cap = None
+            return
+
+        self.sequence = 0
+        self.running = True
+        self.producer = threading.Thread(target=self._produce, name="FrameBusProducer", daemon=True)
+        self.producer.start()
+
+    def _allocate(self, frame):
+        shape = frame.shape
+        if self.bgr_ring is None or self.bgr_ring.shape[1:] != shape:
+            self.bgr_ring = np.empty((self.ring_size,) + shape, dtype=np.uint8)
+            self.rgb_ring = np.empty((self.ring_size,) + shape, dtype=np.uint8)
+
+    def _produce(self):
+        cap = self.cap
+        try:
+            while self.running:
+                timer = metrics.timer()
+
+                # Timestamp the frame when grabbed, before it is decoded
+                if not cap.grab():
+                    metrics.count("errors")
+                    self.failed = True
+                    break
+                slot = self.sequence % self.ring_size
+                self.timestamps[slot] = time.monotonic()
+                timer.lap("grab")
+
+                # Decode straight into the next free slot when the buffer is allocated
+                ret, frame = cap.retrieve(self.bgr_ring[slot] if self.bgr_ring is not None else None)
+                if not ret:
+                    metrics.count("errors")
+                    self.failed = True
+                    break
+                timer.lap("decode")
+
+                self._allocate(frame)
+                if not np.shares_memory(frame, self.bgr_ring[slot]):
+                    np.copyto(self.bgr_ring[slot], frame)
+
+                # Single BGR->RGB conversion shared by every tracker
+                cv2.cvtColor(self.bgr_ring[slot], cv2.COLOR_BGR2RGB, dst=self.rgb_ring[slot])
+                timer.lap("convert")
+
+                with self.lock:
+                    self.sequence += 1
+                    self.frame_ready.notify_all()
+                metrics.count("frames")
+        finally:
+            with self.lock:
+                self.running = False
+                self.frame_ready.notify_all()
+            cap.release()
+            self.cap = None
+
+
+class FrameSubscriber:
+    """Consumer handle for a FrameBus.
+
+    With latest_only (the default) every read returns the most recent frame, skipping frames
+    that arrived while the consumer was busy. Otherwise frames are returned in order as long
+    as the consumer stays within the ring buffer, and only older frames are skipped.
+    """
+
+    def __init__(self, bus, latest_only=True):
+        self.bus = bus
+        self.latest_only = latest_only
+        self.last_sequence = bus.sequence
+        self.dropped_frames = 0
+        self.timestamp = 0.0
+        self.frame = None
+        self.rgb_frame = None
+
+    def is_opened(self):
+        return not self.bus.failed
+
+    def read(self, timeout=1.0):
+        """Wait for a frame newer than the last one read.
+
+        Returns (ret, frame, rgb_frame); `timestamp` then holds the frame's capture time. The
+        returned arrays are owned by this subscriber and reused on the next call. ret is False
+        only once the bus has stopped; it is None if no frame arrived within `timeout` while the
+        camera is still running (slow to start or stalled), and the caller should read again.
+        """
+        bus = self.bus
+        with bus.lock:
+            if not bus.frame_ready.wait_for(lambda: bus.sequence > self.last_sequence or not bus.running, timeout):
+                return None, None, None
+            if bus.sequence <= self.last_sequence:
+                return False, None, None
+
+            sequence = bus.sequence
+            if not self.latest_only:
+                # The producer may be overwriting the slot after the newest, so stay clear of it
+                sequence = max(self.last_sequence + 1, bus.sequence - (bus.ring_size - 2))
+            slot = (sequence - 1) % bus.ring_size
+            bgr_slot = bus.bgr_ring[slot]
+            rgb_slot = bus.rgb_ring[slot]
+            self.timestamp = bus.timestamps[slot]
+
+        self.dropped_frames += sequence - self.last_sequence - 1
+        self.last_sequence = sequence
+
+        # The producer only rewrites this slot after more frames arrive (ring_size - 1 of them
+        # for the newest), so the copy below runs outside the lock. Private buffers keep drawing
+        # on the frame from affecting other trackers
+        if self.frame is None or self.frame.shape != bgr_slot.shape:
+            self.frame = np.empty_like(bgr_slot)
+            self.rgb_frame = np.empty_like(rgb_slot)
+        np.copyto(self.frame, bgr_slot)
+        np.copyto(self.rgb_frame, rgb_slot)
+        return True, self.frame, self.rgb_frame
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+# Shared bus for the default camera, used by all trackers
+_shared_bus = FrameBus()
+
+
+def get_frame_bus():
+    """Return the frame bus shared by all trackers."""
+    return _shared_bus
+
+
+def set_frame_source(source, **capture_settings):
+    """Change what the shared bus reads from and how (see capture.open_camera for the settings).
+
+    Takes effect the next time the capture starts.
+    """
+    _shared_bus.source = source
+    _shared_bus.capture_settings = capture_settings
@@ -0,0 +1,157 @@
+import math
+
+import cv2
+import numpy as np
+
+
+def _smoothing_factor(elapsed, cutoff):
+    tau = 1.0 / (2 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / elapsed)
+
+
+class OneEuroFilter:
+    """One-Euro filter over whole landmark arrays, with linear prediction for skipped frames.
+
+    Slow movements are smoothed heavily to remove jitter while fast movements pass through with
+    little lag. Speed-dependent cutoffs are computed per landmark coordinate in one NumPy step.
+    The defaults suit normalized coordinates, where a limb moves at around 1 unit/s: beta=10
+    raises the cutoff to about 10 Hz then, so a 1 s curl keeps its full range.
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=10.0, derivative_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.derivative_cutoff = derivative_cutoff
+        self.reset()
+
+    def reset(self):
+        self.value = None
+        self.derivative = None
+        self.timestamp = None
+
+    def reset_rows(self, rows, array):
+        """Restart some rows of a stacked array from `array`, e.g. when a new person takes a slot."""
+        if self.value is None or self.value.shape != array.shape:
+            return
+        self.value[rows] = array[rows]
+        self.derivative[rows] = 0
+
+    def __call__(self, array, timestamp):
+        """Filter a new measurement and return the smoothed array."""
+        array = np.asarray(array, dtype=np.float32)
+        if self.value is None or self.value.shape != array.shape or timestamp <= self.timestamp:
+            # First measurement, or the number of detections changed
+            self.value = array.copy()
+            self.derivative = np.zeros_like(array)
+            self.timestamp = timestamp
+            return self.value.copy()
+
+        elapsed = timestamp - self.timestamp
+        derivative = (array - self.value) / elapsed
+        alpha = _smoothing_factor(elapsed, self.derivative_cutoff)
+        self.derivative += alpha * (derivative - self.derivative)
+
+        cutoff = self.min_cutoff + self.beta * np.abs(self.derivative)
+        tau = 1.0 / (2 * np.pi * cutoff)
+        alpha = 1.0 / (1.0 + tau / elapsed)
+        self.value += alpha * (array - self.value)
+        self.timestamp = timestamp
+        return self.value.copy()
+
+    def predict(self, timestamp):
+        """Extrapolate the last filtered value to a later timestamp, or None without history."""
+        if self.value is None:
+            return None
+        return self.value + self.derivative * (timestamp - self.timestamp)
+
+
+class AdaptiveScheduler:
+    """Decide which frames run inference so the loop holds a target frame rate.
+
+    It keeps a moving average of inference time. When that exceeds the per-frame budget, the
+    model runs only every Nth frame, with N = ceil(inference time / budget). The frames in
+    between are filled in by the landmark filter's prediction.
+    """
+
+    def __init__(self, target_fps=30.0, max_interval=4, smoothing=0.1):
+        self.target_fps = target_fps
+        self.max_interval = max_interval
+        self.smoothing = smoothing
+        self.reset()
+
+    def reset(self):
+        self.inference_time = None
+        self.interval = 1
+        self.frames_since_inference = 0
+
+    def should_infer(self):
+        self.frames_since_inference += 1
+        if self.frames_since_inference >= self.interval:
+            self.frames_since_inference = 0
+            return True
+        return False
+
+    def record_inference(self, seconds):
+        """Report how long the last inference took and update the frame interval."""
+        if self.inference_time is None:
+            self.inference_time = seconds
+        else:
+            self.inference_time += self.smoothing * (seconds - self.inference_time)
+
+        if not self.target_fps:
+            self.interval = 1
+            return
+        budget = 1.0 / self.target_fps
+        self.interval = min(max(math.ceil(self.inference_time / budget), 1), self.max_interval)
+
+
+class ResultCache:
+    """Reuse the results of a recent inference while the scene is unchanged.
+
+    Each frame is reduced to a small grayscale thumbnail. If, compared with the thumbnail of a
+    cached inference, no more than `max_changed` of its pixels moved by over `pixel_threshold`
+    gray levels, that inference's results are returned instead of running the model. Up to
+    `max_entries` results are kept, least recently used dropped first, and none is reused
+    more than `max_age` seconds after its inference, so a still scene is re-checked regularly.
+
+    The defaults let any changed thumbnail pixel trigger inference: a forearm covers only a few
+    of them, so a looser fraction would hold results through real movement. A curl then only
+    hits the cache around its turning points, where the landmarks barely move.
+    """
+
+    def __init__(self, size=(64, 48), pixel_threshold=10, max_changed=0.0, max_entries=4, max_age=0.25):
+        self.size = size
+        self.pixel_threshold = pixel_threshold
+        self.max_changed = max_changed
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.entries = []  # [thumbnail, timestamp, value], most recently used last
+        self.small = None
+        self.thumbnail = np.empty(size[::-1], dtype=np.uint8)
+        self.difference = np.empty(size[::-1], dtype=np.uint8)
+
+    def reset(self):
+        self.entries = []
+
+    def lookup(self, rgb_frame, timestamp):
+        """Return the cached results for a frame like this one, or None to run inference.
+
+        On None, pass the new results to `store` for this same frame.
+        """
+        self.small = cv2.resize(rgb_frame, self.size, dst=self.small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self.small, cv2.COLOR_RGB2GRAY, dst=self.thumbnail)
+
+        self.entries = [entry for entry in self.entries if timestamp - entry[1] <= self.max_age]
+        limit = self.max_changed * self.thumbnail.size
+        for index in range(len(self.entries) - 1, -1, -1):
+            cv2.absdiff(self.thumbnail, self.entries[index][0], dst=self.difference)
+            if np.count_nonzero(self.difference > self.pixel_threshold) <= limit:
+                entry = self.entries.pop(index)
+                self.entries.append(entry)
+                return entry[2]
+        return None
+
+    def store(self, value, timestamp):
+        """Cache the results inferred on the frame last passed to `lookup` (copy reused arrays first)."""
+        self.entries.append([self.thumbnail.copy(), timestamp, value])
+        del self.entries[:-self.max_entries]
@@ -0,0 +1,153 @@
+import multiprocessing as mp_processing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from landmark_arrays import LANDMARK_FIELDS, NUM_LANDMARKS, LandmarkResults, extract_landmarks, landmarks_to_array
+
+# Default settings for each model, matching the trackers
+MODEL_SETTINGS = {
+    "pose": dict(static_image_mode=False, model_complexity=1, min_detection_confidence=0.5, min_tracking_confidence=0.5),
+    "hands": dict(static_image_mode=False, max_num_hands=2, min_detection_confidence=0.5, min_tracking_confidence=0.5),
+    "face_mesh": dict(static_image_mode=False, max_num_faces=1, min_detection_confidence=0.5, min_tracking_confidence=0.5),
+}
+
+
+def create_model(model, **settings):
+    """Create a MediaPipe solution for the given model name."""
+    import mediapipe as mp
+
+    options = dict(MODEL_SETTINGS[model], **settings)
+    if model == "pose":
+        return mp.solutions.pose.Pose(**options)
+    if model == "hands":
+        return mp.solutions.hands.Hands(**options)
+    if model == "face_mesh":
+        return mp.solutions.face_mesh.FaceMesh(**options)
+    raise ValueError(f"Unknown model: {model}")
+
+
+def max_detections(model, settings):
+    """Maximum number of landmark sets a model can return per frame."""
+    options = dict(MODEL_SETTINGS[model], **settings)
+    if model == "hands":
+        return options["max_num_hands"]
+    if model == "face_mesh":
+        return options["max_num_faces"]
+    return 1
+
+
+def _inference_worker(model, settings, frame_name, result_name, conn):
+    """Worker process: run one model on frames placed in shared memory."""
+    frame_memory = shared_memory.SharedMemory(name=frame_name)
+    result_memory = shared_memory.SharedMemory(name=result_name)
+    detections = max_detections(model, settings)
+    result = np.ndarray((detections, NUM_LANDMARKS[model], LANDMARK_FIELDS), dtype=np.float32,
+                        buffer=result_memory.buf)
+    solution = create_model(model, **settings)
+    frame = None
+
+    try:
+        while True:
+            shape = conn.recv()
+            if shape is None:
+                break
+
+            try:
+                frame = np.ndarray(shape, dtype=np.uint8, buffer=frame_memory.buf)
+                landmark_lists = extract_landmarks(model, solution.process(frame))[:detections]
+                for i, landmark_list in enumerate(landmark_lists):
+                    landmarks_to_array(landmark_list, out=result[i])
+                conn.send(len(landmark_lists))
+            except Exception as e:
+                conn.send(f"Error in {model} worker: {e}")
+    finally:
+        solution.close()
+        del frame, result
+        frame_memory.close()
+        result_memory.close()
+
+
+class InferencePool:
+    """Run each MediaPipe model in its own worker process.
+
+    Frames are copied once into shared memory read by every worker, and landmarks come back
+    through a shared float32 buffer per model, so no image data is pickled.
+    """
+
+    def __init__(self, model_settings):
+        self.model_settings = model_settings
+        self.context = mp_processing.get_context("spawn")
+        self.frame_memory = None
+        self.frame_capacity = 0
+        self.workers = {}
+        self.results = {}
+
+    def _start(self, nbytes):
+        self.close()
+        self.frame_memory = shared_memory.SharedMemory(create=True, size=nbytes)
+        self.frame_capacity = nbytes
+
+        for model, settings in self.model_settings.items():
+            shape = (max_detections(model, settings), NUM_LANDMARKS[model], LANDMARK_FIELDS)
+            result_memory = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * 4)
+            self.results[model] = np.ndarray(shape, dtype=np.float32, buffer=result_memory.buf)
+            parent_conn, child_conn = self.context.Pipe()
+            process = self.context.Process(
+                target=_inference_worker,
+                args=(model, settings, self.frame_memory.name, result_memory.name, child_conn),
+                name=f"InferenceWorker-{model}",
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+            self.workers[model] = (process, parent_conn, result_memory)
+
+    def process(self, rgb_frame):
+        """Run every model on the frame in parallel and return a LandmarkResults."""
+        if rgb_frame.nbytes > self.frame_capacity:
+            self._start(rgb_frame.nbytes)
+
+        frame = np.ndarray(rgb_frame.shape, dtype=np.uint8, buffer=self.frame_memory.buf)
+        np.copyto(frame, rgb_frame)
+        del frame
+        for process, conn, result_memory in self.workers.values():
+            conn.send(rgb_frame.shape)
+
+        arrays = {}
+        errors = []
+        for model, (process, conn, result_memory) in self.workers.items():
+            try:
+                reply = conn.recv()
+            except EOFError:
+                raise RuntimeError(f"Inference worker for {model} exited unexpectedly.")
+            if isinstance(reply, str):
+                errors.append(reply)
+                continue
+            arrays[model] = self.results[model][:reply].copy()
+
+        if errors:
+            raise RuntimeError("; ".join(errors))
+        return LandmarkResults(arrays)
+
+    def close(self):
+        """Stop the worker processes and free the shared memory."""
+        workers, self.workers = self.workers, {}
+        self.results = {}
+        for process, conn, result_memory in workers.values():
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+            conn.close()
+            result_memory.close()
+            result_memory.unlink()
+
+        if self.frame_memory is not None:
+            self.frame_memory.close()
+            self.frame_memory.unlink()
+            self.frame_memory = None
+            self.frame_capacity = 0
@@ -0,0 +1,77 @@
+import mediapipe as mp
+import numpy as np
+
+from landmark_arrays import LANDMARK_FIELDS, NUM_LANDMARKS, LandmarkResults, landmarks_to_array
+
+PoseLandmark = mp.solutions.pose.PoseLandmark
+
+# Joint angles as (first, vertex, last) pose landmarks; the angle is measured at the vertex
+JOINTS = {
+    "right_elbow": (PoseLandmark.RIGHT_SHOULDER, PoseLandmark.RIGHT_ELBOW, PoseLandmark.RIGHT_WRIST),
+    "left_elbow": (PoseLandmark.LEFT_SHOULDER, PoseLandmark.LEFT_ELBOW, PoseLandmark.LEFT_WRIST),
+    "right_shoulder": (PoseLandmark.RIGHT_ELBOW, PoseLandmark.RIGHT_SHOULDER, PoseLandmark.RIGHT_HIP),
+    "left_shoulder": (PoseLandmark.LEFT_ELBOW, PoseLandmark.LEFT_SHOULDER, PoseLandmark.LEFT_HIP),
+    "right_hip": (PoseLandmark.RIGHT_SHOULDER, PoseLandmark.RIGHT_HIP, PoseLandmark.RIGHT_KNEE),
+    "left_hip": (PoseLandmark.LEFT_SHOULDER, PoseLandmark.LEFT_HIP, PoseLandmark.LEFT_KNEE),
+    "right_knee": (PoseLandmark.RIGHT_HIP, PoseLandmark.RIGHT_KNEE, PoseLandmark.RIGHT_ANKLE),
+    "left_knee": (PoseLandmark.LEFT_HIP, PoseLandmark.LEFT_KNEE, PoseLandmark.LEFT_ANKLE),
+}
+
+
+def pose_to_array(results, out=None):
+    """Convert a pose result into a single (33, 4) array, or return None if no pose was found.
+
+    Accepts MediaPipe Pose results, LandmarkResults from the inference pool, or a bare
+    landmark list. Pass `out` to reuse a preallocated array across frames.
+    """
+    if isinstance(results, LandmarkResults):
+        poses = results.arrays.get("pose")
+        if poses is None or len(poses) == 0:
+            return None
+        if out is None:
+            return poses[0]
+        np.copyto(out, poses[0])
+        return out
+
+    landmark_list = getattr(results, "pose_landmarks", results)
+    if landmark_list is None:
+        return None
+    if out is None:
+        out = np.empty((NUM_LANDMARKS["pose"], LANDMARK_FIELDS), dtype=np.float32)
+    return landmarks_to_array(landmark_list, out=out)
+
+
+class JointAngles:
+    """Compute a configurable set of joint angles in one vectorized call.
+
+    Works on a single (33, 4) pose or on any batch shaped (..., 33, 4) and returns angles in
+    degrees shaped (..., len(joints)), in the order the joints were given.
+    """
+
+    def __init__(self, joints=tuple(JOINTS), min_visibility=None):
+        self.joints = tuple(joints)
+        indices = np.array([JOINTS[joint] for joint in self.joints], dtype=np.intp)
+        self.first, self.vertex, self.last = indices.T
+        self.min_visibility = min_visibility
+
+    def __call__(self, landmarks):
+        landmarks = np.asarray(landmarks)
+        vertex = landmarks[..., self.vertex, :2]
+        to_first = landmarks[..., self.first, :2] - vertex
+        to_last = landmarks[..., self.last, :2] - vertex
+
+        radians = np.arctan2(to_last[..., 1], to_last[..., 0]) - np.arctan2(to_first[..., 1], to_first[..., 0])
+        angles = np.abs(np.degrees(radians))
+        angles = np.where(angles > 180.0, 360.0 - angles, angles)
+
+        if self.min_visibility is not None:
+            # Angles whose landmarks are not visible enough are reported as NaN
+            visibility = np.minimum(np.minimum(landmarks[..., self.first, 3], landmarks[..., self.vertex, 3]),
+                                    landmarks[..., self.last, 3])
+            angles = np.where(visibility >= self.min_visibility, angles, np.nan)
+        return angles
+
+    def index(self, joint):
+        """Column of a joint in the returned angle array."""
+        return self.joints.index(joint)
+
@@ -0,0 +1,92 @@
+import numpy as np
+from mediapipe.framework.formats import landmark_pb2
+
+# Each landmark is stored as (x, y, z, visibility) in float32
+LANDMARK_FIELDS = 4
+
+# Number of landmarks produced by each MediaPipe model
+NUM_LANDMARKS = {
+    "pose": 33,
+    "hands": 21,
+    "face_mesh": 468,
+}
+
+
+def landmarks_to_array(landmark_list, out=None):
+    """Convert a NormalizedLandmarkList into an (N, 4) float32 array."""
+    landmarks = landmark_list.landmark
+    if out is None:
+        out = np.empty((len(landmarks), LANDMARK_FIELDS), dtype=np.float32)
+    for i, landmark in enumerate(landmarks):
+        out[i] = (landmark.x, landmark.y, landmark.z, landmark.visibility)
+    return out
+
+
+def extract_landmarks(model, results):
+    """Return the list of landmark lists found in a MediaPipe result."""
+    if model == "pose":
+        return [results.pose_landmarks] if results.pose_landmarks else []
+    if model == "hands":
+        return results.multi_hand_landmarks or []
+    return results.multi_face_landmarks or []
+
+
+def results_to_array(model, results):
+    """Stack every landmark set a model found into a (num_detections, N, 4) array."""
+    if isinstance(results, LandmarkResults):
+        array = results.arrays.get(model)
+        if array is not None:
+            return array
+        return np.empty((0, NUM_LANDMARKS[model], LANDMARK_FIELDS), dtype=np.float32)
+
+    landmark_lists = extract_landmarks(model, results)
+    array = np.empty((len(landmark_lists), NUM_LANDMARKS[model], LANDMARK_FIELDS), dtype=np.float32)
+    for i, landmark_list in enumerate(landmark_lists):
+        landmarks_to_array(landmark_list, out=array[i])
+    return array
+
+
+def array_to_landmarks(array):
+    """Convert an (N, 4) landmark array back into a NormalizedLandmarkList for drawing."""
+    landmark_list = landmark_pb2.NormalizedLandmarkList()
+    for x, y, z, visibility in array.tolist():
+        landmark_list.landmark.add(x=x, y=y, z=z, visibility=visibility)
+    return landmark_list
+
+
+class LandmarkResults:
+    """Results object mirroring the MediaPipe solution outputs, built from landmark arrays.
+
+    Each entry of `arrays` maps a model name to an (num_detections, N, 4) array. Landmark lists
+    are only rebuilt when a tracker actually reads them.
+    """
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self._converted = {}
+
+    def invalidate(self):
+        """Drop cached landmark lists after the arrays were modified in place."""
+        self._converted.clear()
+
+    def _landmark_lists(self, model):
+        if model not in self._converted:
+            array = self.arrays.get(model)
+            if array is None or len(array) == 0:
+                self._converted[model] = None
+            else:
+                self._converted[model] = [array_to_landmarks(detection) for detection in array]
+        return self._converted[model]
+
+    @property
+    def pose_landmarks(self):
+        landmark_lists = self._landmark_lists("pose")
+        return landmark_lists[0] if landmark_lists else None
+
+    @property
+    def multi_hand_landmarks(self):
+        return self._landmark_lists("hands")
+
+    @property
+    def multi_face_landmarks(self):
+        return self._landmark_lists("face_mesh")
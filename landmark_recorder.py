@@ -0,0 +1,164 @@
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+from landmark_arrays import results_to_array
+
+# File layout: a fixed 64-byte header followed by fixed-stride frame records.
+MAGIC = b"LMKREC01"
+HEADER = struct.Struct("<8sIId")  # magic, version, record size, creation time (epoch seconds)
+HEADER_SIZE = 64
+VERSION = 1
+
+# Presence mask slots in each record; hands use slots 1 and 2 in detection order
+POSE, HANDS, FACE = 0, 1, 3
+
+# Pose keeps visibility at full precision for angle work; hands and face mesh store (x, y, z)
+# as float16, which is well under a pixel at 1080p for normalized coordinates.
+RECORD_DTYPE = np.dtype([
+    ("timestamp", "<f8"),
+    ("present", "u1", (4,)),
+    ("padding", "u1", (4,)),
+    ("pose", "<f4", (33, 4)),
+    ("hands", "<f2", (2, 21, 3)),
+    ("face", "<f2", (468, 3)),
+])
+
+
+class LandmarkRecorder:
+    """Append per-frame pose, hand and face mesh landmarks to a fixed-stride binary file.
+
+    Records are staged in a preallocated chunk and written in one call when it fills up, so
+    recording adds no per-frame allocations to the tracking loop.
+    """
+
+    def __init__(self, path, chunk_frames=256):
+        self.path = path
+        self.file = open(path, "wb")
+        header = HEADER.pack(MAGIC, VERSION, RECORD_DTYPE.itemsize, time.time())
+        self.file.write(header.ljust(HEADER_SIZE, b"\0"))
+        self.chunk = np.zeros(chunk_frames, dtype=RECORD_DTYPE)
+        self.pending = 0
+        self.frame_count = 0
+        self.lock = threading.Lock()
+
+    def record(self, timestamp, pose=None, hands=None, face=None):
+        """Append one frame. Each argument is an (N, 4) array, or a list of them for hands.
+
+        Absent landmarks are written as zeros, so the staging chunk never leaks an earlier frame.
+        """
+        with self.lock:
+            row = self.chunk[self.pending]
+            row["timestamp"] = timestamp
+            row["present"] = 0
+            if pose is not None:
+                row["pose"] = pose
+                row["present"][POSE] = 1
+            else:
+                row["pose"] = 0
+            hands = hands[:2] if hands is not None else ()
+            for slot, hand in enumerate(hands):
+                row["hands"][slot] = hand[:, :3]
+                row["present"][HANDS + slot] = 1
+            row["hands"][len(hands):] = 0
+            if face is not None:
+                row["face"] = face[:, :3]
+                row["present"][FACE] = 1
+            else:
+                row["face"] = 0
+
+            self.pending += 1
+            self.frame_count += 1
+            if self.pending == len(self.chunk):
+                self._flush()
+
+    def record_results(self, timestamp, pose_results=None, hands_results=None, face_results=None):
+        """Append one frame straight from MediaPipe (or LandmarkResults) outputs."""
+        pose = results_to_array("pose", pose_results) if pose_results is not None else ()
+        hands = results_to_array("hands", hands_results) if hands_results is not None else ()
+        face = results_to_array("face_mesh", face_results) if face_results is not None else ()
+        self.record(timestamp, pose=pose[0] if len(pose) else None, hands=hands if len(hands) else None,
+                    face=face[0] if len(face) else None)
+
+    def _flush(self):
+        if self.pending:
+            self.file.write(memoryview(self.chunk[:self.pending]).cast("B"))
+            self.pending = 0
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            if self.file.closed:
+                return
+            self._flush()
+            self.file.close()
+
+
+class LandmarkRecording:
+    """Memory-mapped view of a recording; nothing is read until a slice is accessed."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            magic, version, record_size, created = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a landmark recording.")
+        if version != VERSION or record_size != RECORD_DTYPE.itemsize:
+            raise ValueError(f"Unsupported landmark recording version {version} in {path}.")
+
+        self.path = path
+        self.created = created
+        # A partially written trailing record (e.g. after a crash) is ignored
+        count = (os.path.getsize(path) - HEADER_SIZE) // RECORD_DTYPE.itemsize
+        if count > 0:
+            self.records = np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=RECORD_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        return self.records[index]
+
+    @property
+    def timestamps(self):
+        return self.records["timestamp"]
+
+    @property
+    def present(self):
+        return self.records["present"].astype(bool)
+
+    @property
+    def pose(self):
+        return self.records["pose"]
+
+    @property
+    def hands(self):
+        return self.records["hands"]
+
+    @property
+    def face(self):
+        return self.records["face"]
+
+    def index_at(self, timestamp):
+        """Index of the last frame recorded at or before the timestamp."""
+        return max(int(np.searchsorted(self.timestamps, timestamp, side="right")) - 1, 0)
+
+    def between(self, start, end):
+        """Records with start <= timestamp < end, as a memory-mapped slice."""
+        timestamps = self.timestamps
+        first = np.searchsorted(timestamps, start, side="left")
+        last = np.searchsorted(timestamps, end, side="left")
+        return self.records[first:last]
+
+
+def open_recording(path):
+    """Open a recording written by LandmarkRecorder for replay."""
+    return LandmarkRecording(path)
@@ -0,0 +1,249 @@
+# Binary landmark streaming over TCP.
+#
+# Each packet is a little-endian u32 length followed by:
+#   header   "LMKS", u8 version, u8 section count, u16 reserved, u32 packet number on the connection
+#   section  u8 source, u8 model, u8 encoding, u8 detections K, u8 fields, u32 source frame number,
+#            f8 timestamp, K x i32 track IDs (-1 when untracked), then the (K, N, fields) landmarks
+# The source is the tracker that published the section; every tracker numbers its own frames.
+# Encodings: float32 values, int16 values quantized by QUANT_SCALE, or int8 deltas from the
+# previous quantized section of the same source and model sent on that connection.
+
+import socket
+import socketserver
+import struct
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from landmark_arrays import NUM_LANDMARKS
+from metrics import get_tracker_metrics
+
+MAGIC = b"LMKS"
+VERSION = 2
+PACKET_HEADER = struct.Struct("<4sBBHI")
+SECTION_HEADER = struct.Struct("<BBBBBId")
+LENGTH = struct.Struct("<I")
+
+FLOAT32, INT16, INT8_DELTA = 0, 1, 2
+ENCODING_DTYPES = {FLOAT32: np.float32, INT16: np.int16, INT8_DELTA: np.int8}
+
+# Quantized value = round(normalized value * QUANT_SCALE), covering [-4, 4) in int16
+QUANT_SCALE = 8192
+
+# Wire ID of each model and how many landmark fields are sent (hands and face have no visibility)
+MODEL_IDS = {"pose": 0, "hands": 1, "face_mesh": 2}
+MODEL_NAMES = {model_id: model for model, model_id in MODEL_IDS.items()}
+MODEL_FIELDS = {"pose": 4, "hands": 3, "face_mesh": 3}
+
+# Wire ID of each publishing tracker, by pipeline name
+SOURCE_IDS = {"pose": 0, "face_mesh": 1, "body": 2}
+SOURCE_NAMES = {source_id: source for source, source_id in SOURCE_IDS.items()}
+
+DEFAULT_PORT = 9109
+
+# One decoded packet. Each dict is keyed by (source, model): (K, N, fields) float32 landmarks,
+# (K,) track IDs, timestamps, and the source's frame numbers
+LandmarkPacket = namedtuple("LandmarkPacket", "sequence landmarks track_ids timestamps frames")
+
+metrics = get_tracker_metrics("landmark_stream")
+
+
+class PacketEncoder:
+    """Encode landmark sections for one connection, remembering what that connection last received."""
+
+    def __init__(self, quantize=True, delta=True):
+        self.quantize = quantize
+        self.delta = delta
+        self.previous = {}  # Last quantized array sent per (source, model)
+
+    def encode(self, sequence, sections):
+        """Encode [(source, model, frame, timestamp, landmarks, track_ids)] into one length-prefixed packet."""
+        parts = [PACKET_HEADER.pack(MAGIC, VERSION, len(sections), 0, sequence & 0xFFFFFFFF)]
+        for source, model, frame, timestamp, landmarks, track_ids in sections:
+            values = landmarks[..., :MODEL_FIELDS[model]]
+            encoding = FLOAT32
+            if self.quantize:
+                quantized = np.clip(np.rint(values * QUANT_SCALE), -32768, 32767).astype(np.int16)
+                previous = self.previous.get((source, model))
+                self.previous[(source, model)] = quantized
+                encoding = INT16
+                values = quantized
+                if self.delta and previous is not None and previous.shape == quantized.shape:
+                    difference = quantized.astype(np.int32) - previous
+                    if len(difference) == 0 or np.abs(difference).max() <= 127:
+                        encoding = INT8_DELTA
+                        values = difference.astype(np.int8)
+
+            parts.append(SECTION_HEADER.pack(SOURCE_IDS[source], MODEL_IDS[model], encoding, len(values),
+                                             values.shape[-1], frame & 0xFFFFFFFF, timestamp))
+            parts.append(np.asarray(track_ids, dtype="<i4").tobytes())
+            parts.append(np.ascontiguousarray(values, dtype=np.dtype(ENCODING_DTYPES[encoding]).newbyteorder("<")).tobytes())
+
+        body = b"".join(parts)
+        return LENGTH.pack(len(body)) + body
+
+
+class PacketDecoder:
+    """Decode a byte stream of landmark packets; feed() accepts data in arbitrary pieces."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.previous = {}
+
+    def feed(self, data):
+        """Add received bytes and return the LandmarkPackets completed by them."""
+        self.buffer += data
+        packets = []
+        while len(self.buffer) >= LENGTH.size:
+            (length,) = LENGTH.unpack_from(self.buffer)
+            if len(self.buffer) < LENGTH.size + length:
+                break
+            packets.append(self._decode(bytes(self.buffer[LENGTH.size:LENGTH.size + length])))
+            del self.buffer[:LENGTH.size + length]
+        return packets
+
+    def _decode(self, body):
+        magic, version, section_count, _, sequence = PACKET_HEADER.unpack_from(body)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a landmark stream packet (magic {bytes(magic)!r}, version {version})")
+
+        landmarks, track_ids, timestamps, frames = {}, {}, {}, {}
+        offset = PACKET_HEADER.size
+        for _ in range(section_count):
+            source_id, model_id, encoding, count, fields, frame, timestamp = SECTION_HEADER.unpack_from(body, offset)
+            offset += SECTION_HEADER.size
+            model = MODEL_NAMES[model_id]
+            key = (SOURCE_NAMES[source_id], model)
+            ids = np.frombuffer(body, dtype="<i4", count=count, offset=offset)
+            offset += ids.nbytes
+            dtype = np.dtype(ENCODING_DTYPES[encoding]).newbyteorder("<")
+            values = np.frombuffer(body, dtype=dtype, count=count * NUM_LANDMARKS[model] * fields, offset=offset)
+            values = values.reshape(count, NUM_LANDMARKS[model], fields)
+            offset += values.nbytes
+
+            if encoding == FLOAT32:
+                array = values.astype(np.float32)
+            else:
+                quantized = values.astype(np.int16)
+                if encoding == INT8_DELTA:
+                    quantized = (self.previous[key] + quantized).astype(np.int16)
+                self.previous[key] = quantized
+                array = quantized.astype(np.float32) / QUANT_SCALE
+            landmarks[key] = array
+            track_ids[key] = ids.copy()
+            timestamps[key] = timestamp
+            frames[key] = frame
+        return LandmarkPacket(sequence, landmarks, track_ids, timestamps, frames)
+
+
+class LandmarkStreamServer:
+    """Publish landmarks to TCP clients as compact binary packets.
+
+    publish() only stores the newest landmarks per source tracker and model and wakes the
+    client threads, so it is cheap on the tracker thread. Each client thread sends whatever is newest whenever its
+    socket can take more: a slow client skips packets instead of building a queue, and its
+    delta encoding stays relative to what it actually received.
+    """
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, quantize=True, delta=True):
+        self.quantize = quantize
+        self.delta = delta
+        self.latest = {}  # (source, model) -> (frame, timestamp, landmarks, track_ids)
+        self.frames = {}  # Frames published per source
+        self.sequence = 0  # Changes on every publish, to wake the client threads
+        self.closed = False
+        self.condition = threading.Condition()
+
+        stream = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                stream._serve_client(self.request)
+
+        self.server = socketserver.ThreadingTCPServer((host, port), Handler, bind_and_activate=False)
+        self.server.daemon_threads = True
+        self.server.allow_reuse_address = True
+        self.server.server_bind()
+        self.server.server_activate()
+        self.address = self.server.server_address
+        self.thread = threading.Thread(target=self.server.serve_forever, name="LandmarkStream", daemon=True)
+        self.thread.start()
+
+    def publish(self, source, timestamp, landmarks, track_ids=None):
+        """Publish one frame of {model: (K, N, 4) array or None} landmarks from a tracker; arrays are copied.
+
+        source is the publishing pipeline (a SOURCE_IDS name). track_ids maps a model to its K
+        track IDs (models without an entry send -1).
+        """
+        track_ids = track_ids or {}
+        with self.condition:
+            self.sequence += 1
+            frame = self.frames[source] = self.frames.get(source, 0) + 1
+            for model, array in landmarks.items():
+                if array is None:
+                    array = ()  # Nothing detected
+                array = np.array(array, dtype=np.float32).reshape(-1, NUM_LANDMARKS[model], 4)
+                ids = track_ids.get(model)
+                ids = np.full(len(array), -1, dtype=np.int32) if ids is None else np.asarray(ids, dtype=np.int32)
+                self.latest[(source, model)] = (frame, timestamp, array, ids)
+            self.condition.notify_all()
+
+    def _serve_client(self, connection):
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        encoder = PacketEncoder(self.quantize, self.delta)
+        # Frame number of the last section sent per (source, model); sources already running
+        # when the client connects are counted from their current frame. Snapshot under the
+        # lock, since a tracker may publish a new source or model meanwhile
+        with self.condition:
+            sent = {key: frame - 1 for key, (frame, *_) in self.latest.items()}
+            sent_frames = {source: frame - 1 for source, frame in self.frames.items()}
+            last_sequence = self.sequence
+        packets = 0
+        metrics.count("connections")
+        try:
+            while True:
+                with self.condition:
+                    self.condition.wait_for(lambda: self.closed or self.sequence > last_sequence)
+                    if self.closed:
+                        return
+                    last_sequence = self.sequence
+                    sections = []
+                    for (source, model), (frame, timestamp, array, ids) in self.latest.items():
+                        if frame > sent.get((source, model), 0):
+                            sections.append((source, model, frame, timestamp, array, ids))
+                            sent[(source, model)] = frame
+                    for source, frame in self.frames.items():
+                        metrics.count("dropped_frames", max(frame - sent_frames.get(source, 0) - 1, 0))
+                        sent_frames[source] = frame
+
+                packets += 1
+                packet = encoder.encode(packets, sections)
+                connection.sendall(packet)  # Blocks while the client is behind; newer frames replace older
+                metrics.count("packets")
+                metrics.count("bytes", len(packet))
+        except OSError:
+            pass  # Client disconnected
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def start_landmark_stream(port=DEFAULT_PORT, host="127.0.0.1", quantize=True, delta=True):
+    """Start serving landmark packets from a background thread."""
+    return LandmarkStreamServer(host, port, quantize, delta)
+
+
+def read_landmark_stream(host="127.0.0.1", port=DEFAULT_PORT):
+    """Connect to a landmark stream and yield LandmarkPackets until the server closes it."""
+    decoder = PacketDecoder()
+    with socket.create_connection((host, port)) as connection:
+        while True:
+            data = connection.recv(65536)
+            if not data:
+                return
+            yield from decoder.feed(data)
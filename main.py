@@ -1,9 +1,74 @@
 # main.py
 
+import argparse
+import asyncio
 import tkinter as tk
+import body_tracker
+import face_tracker
+import pose_tracker
 from app_ui import MultiTrackerApp
+from frame_bus import set_frame_source
+from landmark_stream import start_landmark_stream
+from metrics import start_metrics_server, start_summary_log
+from output_sinks import DisplayMultiplexer, NullSink, TeeSink, VideoWriterSink
+from tracker_session import TRACKERS, TrackerSession
+
+
+async def run_headless(pipelines):
+    """Run the pipelines without any window until they stop or Ctrl+C is pressed."""
+    await asyncio.gather(*(TrackerSession(pipeline).run() for pipeline in pipelines))
+
 
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = MultiTrackerApp(root)
-    root.mainloop()
+    parser = argparse.ArgumentParser(description="Multi-tracker application")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on localhost at this port")
+    parser.add_argument("--metrics-log-interval", type=float, help="Print a metrics summary every N seconds")
+    parser.add_argument("--landmark-stream-port", type=int, help="Stream binary landmark packets over TCP on this port")
+    parser.add_argument("--source", default="0", help='Camera index, video file, or "synthetic"')
+    parser.add_argument("--resolution", help="Capture resolution as WIDTHxHEIGHT, e.g. 1280x720")
+    parser.add_argument("--fps", type=float, help="Capture frame rate")
+    parser.add_argument("--fourcc", help="Camera pixel format, e.g. MJPG or YUYV")
+    parser.add_argument("--buffer-size", type=int, default=1, help="Frames the camera driver may queue")
+    parser.add_argument("--hw-decode", action="store_true", help="Use hardware decoding for video files")
+    parser.add_argument("--headless", nargs="+", choices=sorted(TRACKERS), metavar="PIPELINE",
+                        help="Run these pipelines without the UI or any window (pose, face_mesh, body)")
+    parser.add_argument("--record-video", metavar="PATH",
+                        help='Write each tracker\'s annotated frames to its own video, e.g. "videos/{name}.mp4"; '
+                             'the tracker name is added before the extension if {name} is missing, and '
+                             'existing files get a numbered name instead of being overwritten')
+    args = parser.parse_args()
+
+    width, height = map(int, args.resolution.lower().split("x")) if args.resolution else (None, None)
+    capture_settings = dict(width=width, height=height, fps=args.fps, fourcc=args.fourcc, buffer_size=args.buffer_size)
+    if args.hw_decode:
+        capture_settings["hw_acceleration"] = True
+    set_frame_source(args.source, **capture_settings)
+
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port)
+    if args.metrics_log_interval:
+        start_summary_log(args.metrics_log_interval)
+    if args.landmark_stream_port:
+        landmark_stream = start_landmark_stream(args.landmark_stream_port)
+        for tracker in (pose_tracker, face_tracker, body_tracker):
+            tracker.set_landmark_stream(landmark_stream)
+
+    # Camera views go to one tiled window drawn by the Tk loop, and/or to video files
+    display = None if args.headless else DisplayMultiplexer()
+    sinks = [sink for sink in (display, VideoWriterSink(args.record_video) if args.record_video else None) if sink]
+    output_sink = TeeSink(*sinks) if len(sinks) > 1 else sinks[0] if sinks else NullSink()
+    for tracker in (pose_tracker, face_tracker, body_tracker):
+        tracker.set_output_sink(output_sink)
+
+    try:
+        if args.headless:
+            try:
+                asyncio.run(run_headless(args.headless))
+            except KeyboardInterrupt:
+                pass
+        else:
+            root = tk.Tk()
+            app = MultiTrackerApp(root, display)
+            root.mainloop()
+    finally:
+        output_sink.close()
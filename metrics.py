@@ -0,0 +1,177 @@
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# Histogram bucket upper bounds in seconds, from 0.1 ms to 10 s
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.0075, 0.01, 0.015, 0.02, 0.03, 0.04, 0.05,
+           0.075, 0.1, 0.15, 0.2, 0.3, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+
+
+class LatencyHistogram:
+    """Fixed-size latency histogram; recording a value never allocates."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = np.zeros(len(buckets) + 1, dtype=np.int64)  # Last bucket is +Inf
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (max for the +Inf bucket)."""
+        if self.count == 0:
+            return 0.0
+        index = int(np.searchsorted(np.cumsum(self.counts), q * self.count))
+        return self.buckets[index] if index < len(self.buckets) else self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+
+class StageTimer:
+    """Times consecutive stages of one loop iteration: each lap records the time since the last."""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.metrics.observe(stage, now - self.last)
+        self.last = now
+
+
+class TrackerMetrics:
+    """Per-stage latency histograms and counters for one tracker loop."""
+
+    def __init__(self, name):
+        self.name = name
+        self.stages = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def timer(self):
+        return StageTimer(self)
+
+    def reset(self):
+        with self.lock:
+            self.stages = {}
+            self.counters = {}
+
+    def observe(self, stage, seconds):
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            with self.lock:
+                histogram = self.stages.setdefault(stage, LatencyHistogram())
+        histogram.observe(seconds)
+
+    def count(self, counter, amount=1):
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def set_count(self, counter, value):
+        """Set a counter tracked elsewhere, such as a frame subscriber's dropped frames."""
+        self.counters[counter] = value
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.trackers = {}
+        self.lock = threading.Lock()
+
+    def tracker(self, name):
+        with self.lock:
+            if name not in self.trackers:
+                self.trackers[name] = TrackerMetrics(name)
+            return self.trackers[name]
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = ["# TYPE tracker_stage_seconds histogram"]
+        with self.lock:
+            trackers = list(self.trackers.values())
+        for tracker in trackers:
+            for stage, histogram in list(tracker.stages.items()):
+                labels = f'tracker="{tracker.name}",stage="{stage}"'
+                cumulative = np.cumsum(histogram.counts)
+                for bound, count in zip(histogram.buckets, cumulative):
+                    lines.append(f'tracker_stage_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'tracker_stage_seconds_bucket{{{labels},le="+Inf"}} {cumulative[-1]}')
+                lines.append(f"tracker_stage_seconds_sum{{{labels}}} {histogram.total}")
+                lines.append(f"tracker_stage_seconds_count{{{labels}}} {histogram.count}")
+
+        lines.append("# TYPE tracker_events_total counter")
+        for tracker in trackers:
+            for counter, value in list(tracker.counters.items()):
+                lines.append(f'tracker_events_total{{tracker="{tracker.name}",event="{counter}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """Short human-readable summary: mean/p50/p95/p99 per stage, in milliseconds, and counters."""
+        lines = []
+        with self.lock:
+            trackers = list(self.trackers.values())
+        for tracker in trackers:
+            for stage, histogram in list(tracker.stages.items()):
+                lines.append(f"[{tracker.name}] {stage}: n={histogram.count} mean={histogram.mean() * 1000:.1f}ms "
+                             f"p50={histogram.quantile(0.5) * 1000:.1f}ms p95={histogram.quantile(0.95) * 1000:.1f}ms "
+                             f"p99={histogram.quantile(0.99) * 1000:.1f}ms")
+            if tracker.counters:
+                counters = ", ".join(f"{name}={value}" for name, value in sorted(tracker.counters.items()))
+                lines.append(f"[{tracker.name}] {counters}")
+        return "\n".join(lines)
+
+
+registry = MetricsRegistry()
+
+
+def get_tracker_metrics(name):
+    """Return the metrics for a tracker, creating them on first use."""
+    return registry.tracker(name)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = registry.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keep scrapes out of the console
+
+
+def start_metrics_server(port=9108, host="127.0.0.1"):
+    """Serve /metrics in the Prometheus text format from a background thread."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name="MetricsServer", daemon=True)
+    thread.start()
+    return server
+
+
+def start_summary_log(interval=60.0, log=print):
+    """Print a metrics summary every `interval` seconds from a background thread."""
+    stop_event = threading.Event()
+
+    def run():
+        while not stop_event.wait(interval):
+            summary = registry.summary()
+            if summary:
+                log(summary)
+
+    threading.Thread(target=run, name="MetricsSummary", daemon=True).start()
+    return stop_event
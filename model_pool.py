@@ -0,0 +1,120 @@
+import threading
+import time
+
+from inference_pool import MODEL_SETTINGS, create_model
+
+# Seconds a model may go unused before its graph is closed to free memory
+IDLE_TIMEOUT = 300.0
+
+
+class _PoolEntry:
+    def __init__(self, model, settings):
+        self.model = model
+        self.settings = settings
+        self.solution = None
+        self.lock = threading.Lock()  # Serializes process() between everyone sharing the model
+        self.last_used = 0.0
+
+
+class PooledModel:
+    """Handle to a shared MediaPipe model; the graph is built on the first process() call.
+
+    Handles are cheap to create. Every handle with the same key (see ModelPool.get) uses the
+    same graph, one caller at a time.
+    """
+
+    def __init__(self, pool, entry):
+        self.pool = pool
+        self.entry = entry
+
+    def process(self, image):
+        entry = self.entry
+        with entry.lock:
+            if entry.solution is None:
+                entry.solution = create_model(entry.model, **entry.settings)
+                self.pool._watch()
+            entry.last_used = time.monotonic()
+            return entry.solution.process(image)
+
+    @property
+    def loaded(self):
+        return self.entry.solution is not None
+
+
+class ModelPool:
+    """Models keyed by type and settings, created lazily and released after sitting idle."""
+
+    def __init__(self, idle_timeout=IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.reaper = None
+
+    def get(self, model, owner=None, **settings):
+        """Return a handle for a model; settings not given use the defaults in MODEL_SETTINGS.
+
+        Static-image graphs are shared by everyone asking for the same settings. A tracking graph
+        (static_image_mode=False) carries state from one frame to the next, so it is only shared
+        between handles with the same `owner`, e.g. the tracker module feeding it frames.
+        """
+        options = dict(MODEL_SETTINGS[model], **settings)
+        key = (model, tuple(sorted(options.items())), None if options["static_image_mode"] else owner)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = self.entries[key] = _PoolEntry(model, options)
+        return PooledModel(self, entry)
+
+    def release_idle(self, idle_timeout=None):
+        """Close every graph unused for idle_timeout seconds; returns how many were closed."""
+        idle_timeout = self.idle_timeout if idle_timeout is None else idle_timeout
+        now = time.monotonic()
+        released = 0
+        with self.lock:
+            entries = list(self.entries.values())
+        for entry in entries:
+            # A model busy right now is clearly not idle
+            if entry.solution is None or not entry.lock.acquire(blocking=False):
+                continue
+            try:
+                if now - entry.last_used >= idle_timeout:
+                    entry.solution.close()
+                    entry.solution = None
+                    released += 1
+            finally:
+                entry.lock.release()
+        return released
+
+    def close(self):
+        """Close every loaded graph now; handles rebuild them on their next use."""
+        self.release_idle(idle_timeout=0.0)
+
+    def _watch(self):
+        """Start the background thread that releases idle models, once."""
+        with self.lock:
+            if self.reaper is not None or not self.idle_timeout:
+                return
+            self.reaper = threading.Thread(target=self._reap, name="ModelPoolReaper", daemon=True)
+            self.reaper.start()
+
+    def _reap(self):
+        while True:
+            # idle_timeout may be changed to None or 0 while running, which keeps models loaded
+            idle_timeout = self.idle_timeout or 0
+            time.sleep(max(idle_timeout / 4, 1.0))
+            if idle_timeout:
+                self.release_idle(idle_timeout)
+
+
+# Pool shared by all trackers
+model_pool = ModelPool()
+
+
+def get_model(model, owner=None, **settings):
+    """Return a lazily loaded model from the shared pool (see ModelPool.get for owner)."""
+    return model_pool.get(model, owner, **settings)
+
+
+def set_idle_timeout(seconds):
+    """Seconds before unused models are released (None or 0 keeps them loaded)."""
+    model_pool.idle_timeout = seconds or 0
@@ -0,0 +1,235 @@
+import os
+import queue
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from frame_scheduler import OneEuroFilter
+from inference_pool import create_model
+from kinematics import pose_to_array
+from landmark_arrays import LANDMARK_FIELDS, NUM_LANDMARKS
+from roi import RoiPreprocessor
+
+# People tracked at once; also the number of rows in the per-person state arrays
+MAX_PEOPLE = 4
+
+# People seen on one frame: slot (row in the state arrays), persistent ID, and smoothed pose
+TrackedPeople = namedtuple("TrackedPeople", "slots ids poses started")
+
+
+def box_iou(boxes_a, boxes_b):
+    """Intersection over union of every pair of (x0, y0, x1, y1) boxes, shaped (A, B)."""
+    boxes_a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float32).reshape(1, -1, 4)
+    width = np.clip(np.minimum(boxes_a[..., 2], boxes_b[..., 2]) - np.maximum(boxes_a[..., 0], boxes_b[..., 0]), 0, None)
+    height = np.clip(np.minimum(boxes_a[..., 3], boxes_b[..., 3]) - np.maximum(boxes_a[..., 1], boxes_b[..., 1]), 0, None)
+    intersection = width * height
+    area_a = (boxes_a[..., 2] - boxes_a[..., 0]) * (boxes_a[..., 3] - boxes_a[..., 1])
+    area_b = (boxes_b[..., 2] - boxes_b[..., 0]) * (boxes_b[..., 3] - boxes_b[..., 1])
+    return intersection / np.maximum(area_a + area_b - intersection, 1e-6)
+
+
+class PersonDetector:
+    """OpenCV's HOG people detector, run on a downscaled frame.
+
+    It needs no model download and runs fine on a CPU, but at tens of milliseconds per call it
+    is meant to run every few frames, with landmarks carrying the boxes in between.
+    """
+
+    def __init__(self, detection_size=400, min_score=0.3, nms_threshold=0.4):
+        self.detection_size = detection_size  # Longest side of the image searched, in pixels
+        self.min_score = min_score
+        self.nms_threshold = nms_threshold
+        self.hog = cv2.HOGDescriptor()
+        self.hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+
+    def downscale(self, rgb_frame):
+        height, width = rgb_frame.shape[:2]
+        scale = min(self.detection_size / max(width, height), 1.0)
+        return cv2.resize(rgb_frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+
+    def detect(self, image):
+        """Normalized (x0, y0, x1, y1) person boxes, shaped (D, 4); pass the output of `downscale`."""
+        rects, scores = self.hog.detectMultiScale(image, winStride=(8, 8), padding=(8, 8), scale=1.1)
+        if len(rects) == 0:
+            return np.empty((0, 4), dtype=np.float32)
+        scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+        keep = np.asarray(cv2.dnn.NMSBoxes(np.asarray(rects).tolist(), scores.tolist(), self.min_score,
+                                           self.nms_threshold), dtype=np.intp).reshape(-1)
+        rects = np.asarray(rects, dtype=np.float32)[keep]
+        height, width = image.shape[:2]
+        return np.column_stack([rects[:, 0], rects[:, 1], rects[:, 0] + rects[:, 2], rects[:, 1] + rects[:, 3]]) / (
+            width, height, width, height)
+
+
+class TrackAssigner:
+    """Give person boxes persistent IDs across frames by greedy IoU matching.
+
+    Tracks live in fixed slots so that per-person state (rep counts, filters) can be kept in
+    arrays indexed by slot. A slot is freed after `max_missed` inferences without a pose.
+    """
+
+    def __init__(self, max_tracks=MAX_PEOPLE, iou_threshold=0.3, max_missed=5, duplicate_iou=0.7):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.duplicate_iou = duplicate_iou  # Tracks overlapping this much are following one person
+        self.ids = np.full(max_tracks, -1, dtype=np.int64)  # -1 marks a free slot
+        self.boxes = np.zeros((max_tracks, 4), dtype=np.float32)
+        self.missed = np.zeros(max_tracks, dtype=np.int32)
+        self.next_id = 0
+
+    @property
+    def active(self):
+        return self.ids >= 0
+
+    def reset(self):
+        self.ids.fill(-1)
+        self.missed.fill(0)
+
+    def assign(self, boxes):
+        """Match detected boxes to tracks and start tracks for the rest.
+
+        Returns the slots that started a new track. Matched tracks move to the detected box.
+        """
+        slots = np.flatnonzero(self.active)
+        iou = box_iou(boxes, self.boxes[slots])
+        unmatched = np.ones(len(boxes), dtype=bool)
+        while iou.size and iou.max() >= self.iou_threshold:
+            box, track = np.unravel_index(np.argmax(iou), iou.shape)
+            self.boxes[slots[track]] = boxes[box]
+            self.missed[slots[track]] = 0
+            unmatched[box] = False
+            iou[box, :] = 0
+            iou[:, track] = 0
+
+        started = []
+        free = list(np.flatnonzero(~self.active))
+        for box in np.asarray(boxes)[unmatched]:
+            if not free:
+                break
+            slot = free.pop(0)
+            self.ids[slot] = self.next_id
+            self.next_id += 1
+            self.boxes[slot] = box
+            self.missed[slot] = 0
+            started.append(slot)
+        return np.asarray(started, dtype=np.intp)
+
+    def update(self, slot, box):
+        """Move a track to the box around its latest landmarks; None counts as a miss."""
+        if box is None:
+            self.missed[slot] += 1
+            if self.missed[slot] > self.max_missed:
+                self.ids[slot] = -1
+        else:
+            self.boxes[slot] = box
+            self.missed[slot] = 0
+
+    def drop_duplicates(self):
+        """Free the younger of any two tracks that ended up on the same person."""
+        slots = np.flatnonzero(self.active)
+        iou = np.triu(box_iou(self.boxes[slots], self.boxes[slots]), k=1)
+        for first, second in zip(*np.nonzero(iou >= self.duplicate_iou)):
+            if self.ids[slots[first]] >= 0 and self.ids[slots[second]] >= 0:
+                younger = slots[first] if self.ids[slots[first]] > self.ids[slots[second]] else slots[second]
+                self.ids[younger] = -1
+
+
+class MultiPersonPose:
+    """Track the pose of several people: detect, crop each person, and run pose on the crops.
+
+    The detector runs in the background every `detect_interval` frames (or as soon as nobody
+    is tracked); between detections each person's crop follows their own landmarks. Crops are
+    processed concurrently by a small pool of static-image pose models, at most `max_batch`
+    per frame, oldest first, so a crowded frame costs the loop no more than one batch; people
+    left out are predicted by the filter. Smoothing state is one stacked array for all slots.
+    """
+
+    def __init__(self, max_people=MAX_PEOPLE, detect_interval=15, inference_size=256, max_batch=None):
+        self.detector = PersonDetector()
+        self.assigner = TrackAssigner(max_people)
+        self.roi = RoiPreprocessor(inference_size, padding=0.25)
+        self.detect_interval = detect_interval
+        workers = max(1, min(max_people, os.cpu_count() or 1))
+        self.max_batch = max_batch or workers
+
+        # Static-image models hold no per-person state, so any worker can run any crop
+        self.models = queue.SimpleQueue()
+        for _ in range(workers):
+            self.models.put(create_model("pose", static_image_mode=True))
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="PersonPose")
+        self.detector_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="PersonDetector")
+        self.detection = None  # Pending background detection
+        self.frames_since_detection = 0
+
+        self.poses = np.zeros((max_people, NUM_LANDMARKS["pose"], LANDMARK_FIELDS), dtype=np.float32)
+        self.has_pose = np.zeros(max_people, dtype=bool)
+        self.last_inference = np.zeros(max_people, dtype=np.int64)
+        self.frame_index = 0
+        self.filter = OneEuroFilter()
+
+    def reset(self):
+        self.assigner.reset()
+        self.has_pose.fill(False)
+        self.filter.reset()
+        self.frames_since_detection = self.detect_interval
+
+    def _infer(self, rgb_frame, box):
+        image, transform = self.roi.prepare(rgb_frame, box)
+        model = self.models.get()
+        try:
+            pose = pose_to_array(model.process(image))
+        finally:
+            self.models.put(model)
+        return None if pose is None else transform.restore(pose)
+
+    def process(self, rgb_frame, timestamp):
+        """Update every tracked person from one frame and return a TrackedPeople."""
+        self.frame_index += 1
+        self.frames_since_detection += 1
+        started = np.empty(0, dtype=np.intp)
+        if self.detection is not None and self.detection.done():
+            started = self.assigner.assign(self.detection.result())
+            self.has_pose[started] = False
+            self.detection = None
+        if self.detection is None and (self.frames_since_detection >= self.detect_interval
+                                       or not self.assigner.active.any()):
+            image = self.detector.downscale(rgb_frame)  # A new array, safe to hand to the thread
+            self.detection = self.detector_executor.submit(self.detector.detect, image)
+            self.frames_since_detection = 0
+
+        # Infer the people who have waited longest; the rest are predicted this frame
+        active = np.flatnonzero(self.assigner.active)
+        batch = active[np.argsort(self.last_inference[active], kind="stable")][:self.max_batch]
+        futures = [(slot, self.executor.submit(self._infer, rgb_frame, self.assigner.boxes[slot].copy()))
+                   for slot in batch]
+        for slot, future in futures:
+            pose = future.result()
+            self.last_inference[slot] = self.frame_index
+            if pose is None:
+                self.assigner.update(slot, None)
+                continue
+            self.assigner.update(slot, np.clip((*pose[:, :2].min(axis=0), *pose[:, :2].max(axis=0)), 0, 1))
+            self.poses[slot] = pose
+            if not self.has_pose[slot]:
+                self.filter.reset_rows(slot, self.poses)
+                self.has_pose[slot] = True
+        self.assigner.drop_duplicates()
+
+        predicted = self.filter.predict(timestamp)
+        if predicted is not None:
+            skipped = np.setdiff1d(active, batch)
+            self.poses[skipped] = predicted[skipped]
+        smoothed = self.filter(self.poses, timestamp)
+
+        # People whose last crop found no pose are held back until they are found again or dropped
+        slots = np.flatnonzero(self.assigner.active & self.has_pose & (self.assigner.missed == 0))
+        return TrackedPeople(slots, self.assigner.ids[slots], smoothed[slots], started)
+
+    def close(self):
+        self.detector_executor.shutdown(wait=True)
+        self.executor.shutdown(wait=True)
+        while not self.models.empty():
+            self.models.get().close()
@@ -0,0 +1,232 @@
+import math
+import os
+import queue
+import threading
+
+import cv2
+import numpy as np
+
+from metrics import get_tracker_metrics
+
+
+class NullSink:
+    """Discard frames, for running the trackers without a display."""
+
+    def show(self, name, frame, timestamp):
+        """Take one annotated frame from a tracker thread; returns False if the tracker should stop."""
+        return True
+
+    def remove(self, name):
+        """The tracker showing `name` has stopped."""
+
+    def close(self):
+        pass
+
+
+class DisplayMultiplexer(NullSink):
+    """Show every active tracker in one tiled OpenCV window, drawn from the main thread.
+
+    Tracker threads only copy their frame into a per-tracker latest-frame slot, so they never
+    touch HighGUI or wait for the screen. The main thread calls pump() periodically (the Tk
+    loop does it with after()), which redraws the tiles that changed, shows them and handles
+    the keyboard. Pressing 'q' stops every tracker, as it did with one window per tracker.
+    """
+
+    def __init__(self, window_name="Trackers", tile_width=640):
+        self.window_name = window_name
+        self.tile_width = tile_width
+        self.lock = threading.Lock()
+        self.slots = {}  # name -> [pending frame, has new frame, displayed frame]
+        self.quit = threading.Event()
+        self.canvas = None
+        self.window_open = False
+        self.metrics = get_tracker_metrics("display")
+
+    def show(self, name, frame, timestamp):
+        with self.lock:
+            slot = self.slots.get(name)
+            if slot is None:
+                slot = self.slots[name] = [None, False, None]
+            if slot[0] is None or slot[0].shape != frame.shape:
+                slot[0] = np.empty_like(frame)
+            elif slot[1]:
+                self.metrics.count("dropped_frames")  # Replaced before it was drawn
+            np.copyto(slot[0], frame)
+            slot[1] = True
+        return not self.quit.is_set()
+
+    def remove(self, name):
+        with self.lock:
+            self.slots.pop(name, None)
+
+    def pump(self):
+        """Draw the latest frames and poll the keyboard; main thread only. Returns False after 'q'."""
+        with self.lock:
+            names = sorted(self.slots)
+            changed = False
+            for slot in self.slots.values():
+                if slot[1]:
+                    # Swap buffers so the tracker writes into the one that is not being drawn
+                    slot[0], slot[2] = slot[2], slot[0]
+                    slot[1] = False
+                    changed = True
+            frames = [self.slots[name][2] for name in names]
+
+        if not names:
+            # Every tracker has stopped: close the window and let the next start run again
+            if self.window_open:
+                cv2.destroyWindow(self.window_name)
+                self.window_open = False
+                self.canvas = None
+            quit_requested = self.quit.is_set()
+            self.quit.clear()
+            return not quit_requested
+        if all(frame is None for frame in frames):
+            return not self.quit.is_set()
+
+        if changed or self.canvas is None:
+            self._draw(names, frames)
+            cv2.imshow(self.window_name, self.canvas)
+            self.window_open = True
+            self.metrics.count("frames")
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            self.quit.set()
+        return not self.quit.is_set()
+
+    def _draw(self, names, frames):
+        reference = next(frame for frame in frames if frame is not None)
+        tile_height = round(self.tile_width * reference.shape[0] / reference.shape[1])
+        columns = math.ceil(math.sqrt(len(names)))
+        rows = math.ceil(len(names) / columns)
+        shape = (rows * tile_height, columns * self.tile_width, 3)
+        if self.canvas is None or self.canvas.shape != shape:
+            self.canvas = np.zeros(shape, dtype=np.uint8)
+
+        for index, (name, frame) in enumerate(zip(names, frames)):
+            y, x = (index // columns) * tile_height, (index % columns) * self.tile_width
+            tile = self.canvas[y:y + tile_height, x:x + self.tile_width]
+            if frame is None:
+                tile.fill(0)
+                continue
+            if frame.shape[:2] == tile.shape[:2]:
+                tile[:] = frame
+            else:
+                tile[:] = cv2.resize(frame, (self.tile_width, tile_height), interpolation=cv2.INTER_AREA)
+            cv2.putText(tile, name, (10, tile_height - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        # Blank any tiles left over in the last row
+        for index in range(len(names), rows * columns):
+            y, x = (index // columns) * tile_height, (index % columns) * self.tile_width
+            self.canvas[y:y + tile_height, x:x + self.tile_width] = 0
+
+    def close(self):
+        """Close the window; main thread only."""
+        with self.lock:
+            self.slots.clear()
+        if self.window_open:
+            cv2.destroyWindow(self.window_name)
+            self.window_open = False
+
+
+class VideoWriterSink(NullSink):
+    """Encode each tracker's frames to its own video file on a background thread.
+
+    `path` may contain "{name}", filled with a file-safe version of the tracker name; without
+    it the name is added before the extension, so trackers never share a file. Existing files
+    are not overwritten: a restarted tracker records to "<name>_2", "<name>_3" and so on.
+
+    Files are written at `fps`, whatever rate the tracker runs at: each frame is repeated or
+    skipped according to its timestamp, so recordings play back in real time. Frames are
+    copied into a bounded queue; if encoding falls behind, new frames are dropped (and
+    counted) rather than slowing the trackers down.
+    """
+
+    def __init__(self, path="{name}.mp4", fps=30.0, fourcc="mp4v", max_queued=64):
+        if "{name}" not in path:
+            root, extension = os.path.splitext(path)
+            path = f"{root}_{{name}}{extension}"
+        self.path = path
+        self.fps = fps
+        self.fourcc = fourcc
+        self.queue = queue.Queue(max_queued)
+        self.writers = {}  # name -> [writer, first timestamp, frames written]
+        self.metrics = get_tracker_metrics("video_writer")
+        self.thread = threading.Thread(target=self._write, name="VideoWriter", daemon=True)
+        self.thread.start()
+
+    def show(self, name, frame, timestamp):
+        try:
+            self.queue.put_nowait((name, frame.copy(), timestamp))
+        except queue.Full:
+            self.metrics.count("dropped_frames")
+        return True
+
+    def remove(self, name):
+        self.queue.put((name, None, None))
+
+    def close(self):
+        """Finish writing everything queued and close the files."""
+        self.queue.put(None)
+        self.thread.join()
+
+    def _write(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            name, frame, timestamp = item
+            if frame is None:
+                entry = self.writers.pop(name, None)
+                if entry is not None:
+                    entry[0].release()
+                continue
+
+            entry = self.writers.get(name)
+            if entry is None:
+                safe_name = "".join(c if c.isalnum() or c in "-_" else "_" for c in name).strip("_")
+                path = self.path.format(name=safe_name)
+                number = 1
+                while os.path.exists(path):
+                    number += 1
+                    path = self.path.format(name=f"{safe_name}_{number}")
+                if os.path.dirname(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*self.fourcc), self.fps,
+                                         (frame.shape[1], frame.shape[0]))
+                if not writer.isOpened():
+                    print(f"Error: Could not open video writer for {path}")
+                entry = self.writers[name] = [writer, timestamp, 0]
+            writer, first_timestamp, written = entry
+            if not writer.isOpened():
+                continue
+
+            # Fill the file up to this frame's time; frames arriving faster than fps are skipped
+            due = int((timestamp - first_timestamp) * self.fps) + 1
+            for _ in range(due - written):
+                writer.write(frame)
+            entry[2] = max(written, due)
+            self.metrics.count("frames")
+
+        for writer, *_ in self.writers.values():
+            writer.release()
+        self.writers.clear()
+
+
+class TeeSink(NullSink):
+    """Send frames to several sinks; the tracker stops if any of them asks it to."""
+
+    def __init__(self, *sinks):
+        self.sinks = sinks
+
+    def show(self, name, frame, timestamp):
+        keep_running = True
+        for sink in self.sinks:
+            keep_running = sink.show(name, frame, timestamp) and keep_running
+        return keep_running
+
+    def remove(self, name):
+        for sink in self.sinks:
+            sink.remove(name)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
@@ -1,141 +1,269 @@
+import threading
+import time
+
 import cv2
-import mediapipe as mp
 import numpy as np
 
-# Initialize BlazePose model
-mp_pose = mp.solutions.pose
-pose = mp_pose.Pose(static_image_mode=False, model_complexity=1, min_detection_confidence=0.5, min_tracking_confidence=0.5)
-mp_drawing = mp.solutions.drawing_utils
+from exercises import CURLS, RepCounter
+from frame_bus import get_frame_bus
+from frame_scheduler import OneEuroFilter, ResultCache
+from inference_pool import InferencePool
+from kinematics import pose_to_array
+from landmark_arrays import LandmarkResults, results_to_array
+from metrics import get_tracker_metrics
+from model_pool import get_model
+from multi_person import MultiPersonPose
+from output_sinks import NullSink
+from renderer import skeleton_renderer
+from roi import RoiPreprocessor
+
+# BlazePose model from the shared pool, loaded on the first frame
+pose = get_model("pose", __name__)
 
 # Global variables
-tracking = False
-right_arm_position = "down"  # Track if the right arm is in "up" or "down" position
-left_arm_position = "down"  # Track if the left arm is in "up" or "down" position
-right_curl_count = 0  # Counter for right arm curls
-left_curl_count = 0  # Counter for left arm curls
+run_lock = threading.Lock()  # Held while a tracking loop runs; the module state supports one loop at a time
+stop_requested = threading.Event()  # Stops the loop started by start_pose_tracking
+rep_counter = RepCounter(CURLS)  # Up/down state and rep counts for each active exercise
+pose_roi = RoiPreprocessor()  # Downscales the frame before inference
+pose_filter = OneEuroFilter()  # Smooths landmark jitter for steadier joint angles
+result_cache = ResultCache()  # Skips inference while the scene is unchanged
+output_sink = NullSink()  # Receives the annotated frames; headless until set_output_sink
+inference_backend = "thread"  # "thread" runs the model in-process, "process" in a worker process
+landmark_recorder = None  # Optional LandmarkRecorder for saving landmarks
+landmark_stream = None  # Optional LandmarkStreamServer for downstream consumers
+metrics = get_tracker_metrics("pose")  # Per-stage latency histograms and counters
+pose_buffer = np.empty((33, 4), dtype=np.float32)  # Pose array reused for every frame
+people = None  # MultiPersonPose when tracking several people (see set_max_people)
+
+# Skeleton and label colors for people in multi-person mode, picked by track ID
+PERSON_COLORS = [(0, 255, 0), (255, 128, 0), (0, 200, 255), (255, 0, 255), (255, 255, 0), (128, 128, 255)]
+
+
+def set_inference_backend(backend):
+    """Select "thread" to run models in-process or "process" for one worker process per model."""
+    global inference_backend
+    if backend not in ("thread", "process"):
+        raise ValueError(f"Unknown inference backend: {backend}")
+    inference_backend = backend
+
+
+def set_landmark_recorder(recorder):
+    """Set a LandmarkRecorder that receives every frame's landmarks (None to stop recording)."""
+    global landmark_recorder
+    landmark_recorder = recorder
+
+
+def set_landmark_stream(stream):
+    """Set a LandmarkStreamServer that receives every frame's landmarks (None to stop streaming)."""
+    global landmark_stream
+    landmark_stream = stream
+
+
+def set_output_sink(sink):
+    """Set where annotated frames go: a DisplayMultiplexer, VideoWriterSink, NullSink, etc."""
+    global output_sink
+    output_sink = sink
+
+
+def set_result_cache(cache):
+    """Set a ResultCache that reuses results while the scene is unchanged (None to always infer)."""
+    global result_cache
+    result_cache = cache
+
+
+def set_inference_size(size):
+    """Set the longest side, in pixels, of the image handed to the model (None for full size)."""
+    pose_roi.inference_size = size
+
+
+def set_exercises(exercises):
+    """Choose which exercises are counted, by name (see exercises.EXERCISES)."""
+    global rep_counter
+    rep_counter = RepCounter(exercises, max_tracks=len(rep_counter.up))
+
+
+def set_max_people(max_people):
+    """Track up to this many people, each with their own rep counts (1 for single-person mode).
+
+    Multi-person mode runs its own pool of pose models, so the inference backend is ignored.
+    Call it while tracking is stopped.
+    """
+    global people, rep_counter
+    if people is not None:
+        people.close()
+    people = MultiPersonPose(max_people) if max_people > 1 else None
+    rep_counter = RepCounter(rep_counter.exercises, max_tracks=max_people)
 
 
-def calculate_angle(a, b, c):
-    """Calculate the angle between three points."""
-    a = np.array(a)  # Shoulder
-    b = np.array(b)  # Elbow
-    c = np.array(c)  # Wrist
+def reset_state():
+    """Forget the landmark history and rep counts before a new session."""
+    rep_counter.reset()
+    pose_filter.reset()
+    if result_cache is not None:
+        result_cache.reset()
+    if people is not None:
+        people.reset()
 
-    radians = np.arctan2(c[1] - b[1], c[0] - b[0]) - np.arctan2(a[1] - b[1], a[0] - b[0])
-    angle = np.abs(radians * 180.0 / np.pi)
 
-    if angle > 180.0:
-        angle = 360 - angle
-    return angle
+def process_frame(frame, rgb_frame, timestamp, timer, inference_pool=None):
+    """Run the pose pipeline on one frame: inference, recording, rep counting and drawing onto `frame`.
 
+    This is the camera-independent core of the tracker; returns the model results.
+    """
+    if people is not None:
+        return process_people(frame, rgb_frame, timestamp, timer)
 
-def track_body():
-    global tracking, right_arm_position, left_arm_position, right_curl_count, left_curl_count
-    cap = cv2.VideoCapture(0)
+    cached = result_cache.lookup(rgb_frame, timestamp) if result_cache is not None else None
+    if cached is not None:
+        results = LandmarkResults({"pose": cached})
+        metrics.count("cached_inference")
+        timer.lap("cache")
+    else:
+        # The pose needs the whole body in view, so the frame is only downscaled
+        input_image, _ = pose_roi.prepare(rgb_frame)
+        if inference_pool is not None:
+            results = inference_pool.process(input_image)
+        else:
+            results = pose.process(input_image)
+        if result_cache is not None:
+            result_cache.store(np.array(results_to_array("pose", results)), timestamp)
+        timer.lap("inference")
 
-    if not cap.isOpened():
+    if landmark_recorder is not None:
+        landmark_recorder.record_results(timestamp, pose_results=results)
+        timer.lap("record")
+
+    # Convert the pose once per frame and update every exercise in one step
+    pose_array = pose_to_array(results, out=pose_buffer)
+    if landmark_stream is not None:
+        landmark_stream.publish("pose", timestamp, {"pose": pose_array})
+        timer.lap("stream")
+    if pose_array is not None:
+        # Angles and the skeleton use the smoothed pose; recordings and the stream keep the measured one
+        pose_array = pose_filter(pose_array, timestamp)
+        rep_counter.update(pose_array)
+        positions = rep_counter.up[0]
+        counts = rep_counter.counts[0]
+
+        # Skeleton color logic
+        skeleton_color = (0, 255, 0) if positions.any() else (255, 255, 255)
+
+        # Draw skeleton
+        skeleton_renderer.draw(frame, pose_array, line_color=skeleton_color, point_color=skeleton_color)
+
+        # Display counters, then feedback for each exercise
+        lines = [(f"{exercise.label}: {count}", (255, 255, 255))
+                 for exercise, count in zip(rep_counter.exercises, counts)]
+        for exercise, up in zip(rep_counter.exercises, positions):
+            feedback = exercise.cue if up else "Starting Point"
+            lines.append((f"{exercise.part}: {feedback}", (0, 255, 0) if up else (0, 0, 255)))
+        for row, (text, color) in enumerate(lines):
+            cv2.putText(frame, text, (50, 50 + 40 * row), cv2.FONT_HERSHEY_SIMPLEX, 0.55, color, 2)
+    timer.lap("render")
+    return results
+
+
+def process_people(frame, rgb_frame, timestamp, timer):
+    """Multi-person version of process_frame, with each person's rep counts drawn above them.
+
+    Returns the TrackedPeople for the frame.
+    """
+    tracked = people.process(rgb_frame, timestamp)
+    rep_counter.reset(tracked.started)  # A new ID starts from zero reps
+    timer.lap("inference")
+
+    if landmark_recorder is not None and len(tracked.slots):
+        # Recordings hold one pose per frame: keep the person tracked the longest
+        landmark_recorder.record(timestamp, pose=tracked.poses[np.argmin(tracked.ids)])
+        timer.lap("record")
+
+    if landmark_stream is not None:
+        landmark_stream.publish("pose", timestamp, {"pose": tracked.poses}, {"pose": tracked.ids})
+        timer.lap("stream")
+
+    if len(tracked.slots):
+        # Every person's exercises are updated in one step, one counter row per slot
+        rep_counter.update(tracked.poses, tracked.slots)
+        height, width = frame.shape[:2]
+        skeleton_renderer.draw(frame, tracked.poses)
+        for slot, person_id, pose in zip(tracked.slots, tracked.ids, tracked.poses):
+            color = PERSON_COLORS[person_id % len(PERSON_COLORS)]
+            counts = ", ".join(f"{exercise.label}: {count}"
+                               for exercise, count in zip(rep_counter.exercises, rep_counter.counts[slot]))
+            x = int(np.clip(pose[:, 0].min(), 0, 1) * width)
+            y = max(int(np.clip(pose[:, 1].min(), 0, 1) * height) - 10, 20)
+            cv2.putText(frame, f"#{person_id} {counts}", (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+    timer.lap("render")
+    return tracked
+
+
+def track_body(stop_event, on_result=None):
+    """Run the camera loop on this thread until stop_event is set (or the output sink asks it to stop).
+
+    on_result(timestamp, frame, results) is called from this thread after every frame, with
+    the annotated frame and process_frame's results; both are reused, so copy them to keep them.
+    """
+    subscriber = get_frame_bus().subscribe()
+
+    if not subscriber.is_opened():
+        subscriber.close()
         print("Error: Camera not accessible.")
         return
 
+    inference_pool = InferencePool({"pose": {}}) if inference_backend == "process" else None
+    reset_state()
+
     try:
-        while tracking:
-            ret, frame = cap.read()
+        while not stop_event.is_set():
+            timer = metrics.timer()
+
+            # Shared camera frame, already converted to RGB by the frame bus
+            ret, frame, rgb_frame = subscriber.read()
+            if ret is None:
+                continue  # No frame yet; check for a stop request and keep waiting
             if not ret:
+                metrics.count("errors")
                 print("Error: Failed to read frame from camera.")
                 break
+            metrics.count("frames")
+            metrics.set_count("dropped_frames", subscriber.dropped_frames)
+            timer.lap("capture")
+
+            results = process_frame(frame, rgb_frame, subscriber.timestamp, timer, inference_pool)
+            if on_result is not None:
+                on_result(subscriber.timestamp, frame, results)
+                timer.lap("callback")
 
-            # Convert image color to RGB
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = pose.process(rgb_frame)
-
-            if results.pose_landmarks:
-                landmarks = results.pose_landmarks.landmark
-
-                # Right arm landmarks
-                right_shoulder = [landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER.value].x,
-                                  landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER.value].y]
-                right_elbow = [landmarks[mp_pose.PoseLandmark.RIGHT_ELBOW.value].x,
-                               landmarks[mp_pose.PoseLandmark.RIGHT_ELBOW.value].y]
-                right_wrist = [landmarks[mp_pose.PoseLandmark.RIGHT_WRIST.value].x,
-                               landmarks[mp_pose.PoseLandmark.RIGHT_WRIST.value].y]
-
-                # Left arm landmarks
-                left_shoulder = [landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].x,
-                                 landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].y]
-                left_elbow = [landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value].x,
-                              landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value].y]
-                left_wrist = [landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value].x,
-                              landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value].y]
-
-                # Calculate angles
-                right_angle = calculate_angle(right_shoulder, right_elbow, right_wrist)
-                left_angle = calculate_angle(left_shoulder, left_elbow, left_wrist)
-
-                # Right arm curl logic
-                if right_angle < 45 and right_arm_position == "down":
-                    right_arm_position = "up"
-                    right_curl_count += 1
-                elif right_angle > 160 and right_arm_position == "up":
-                    right_arm_position = "down"
-
-                # Left arm curl logic
-                if left_angle < 45 and left_arm_position == "down":
-                    left_arm_position = "up"
-                    left_curl_count += 1
-                elif left_angle > 160 and left_arm_position == "up":
-                    left_arm_position = "down"
-
-                # Skeleton color logic
-                skeleton_color = (0, 255, 0) if right_arm_position == "up" or left_arm_position == "up" else (255, 255, 255)
-
-                # Draw skeleton
-                mp_drawing.draw_landmarks(
-                    image=frame,
-                    landmark_list=results.pose_landmarks,
-                    connections=mp_pose.POSE_CONNECTIONS,
-                    landmark_drawing_spec=mp_drawing.DrawingSpec(color=skeleton_color, thickness=2, circle_radius=2),
-                    connection_drawing_spec=mp_drawing.DrawingSpec(color=skeleton_color, thickness=2, circle_radius=2),
-                )
-
-                # Display feedback
-                right_feedback = "Nice Curl!" if right_arm_position == "up" else "Starting Point"
-                left_feedback = "Nice Curl!" if left_arm_position == "up" else "Starting Point"
-
-                # Display feedback and counters
-                cv2.putText(frame, f"Right Curls: {right_curl_count}", (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.55,
-                            (255, 255, 255), 2)
-                cv2.putText(frame, f"Left Curls: {left_curl_count}", (50, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.55,
-                            (255, 255, 255), 2)
-                cv2.putText(frame, f"Right Arm: {right_feedback}", (50, 130), cv2.FONT_HERSHEY_SIMPLEX, 0.55,
-                            (0, 255, 0) if right_arm_position == "up" else (0, 0, 255), 2)
-                cv2.putText(frame, f"Left Arm: {left_feedback}", (50, 170), cv2.FONT_HERSHEY_SIMPLEX, 0.55,
-                            (0, 255, 0) if left_arm_position == "up" else (0, 0, 255), 2)
-
-            cv2.imshow("Bicep Curl Tracker", frame)
-
-            if cv2.waitKey(1) & 0xFF == ord('q'):  # Press 'q' to quit
+            keep_running = output_sink.show("Bicep Curl Tracker", frame, subscriber.timestamp)
+            timer.lap("output")
+            metrics.observe("end_to_end", time.monotonic() - subscriber.timestamp)
+            if not keep_running:  # 'q' pressed in the display
                 break
 
     except Exception as e:
+        metrics.count("errors")
         print(f"Error: {e}")
 
     finally:
-        cap.release()
-        cv2.destroyAllWindows()
+        subscriber.close()
+        if inference_pool is not None:
+            inference_pool.close()
+        output_sink.remove("Bicep Curl Tracker")
         print("Tracking stopped, resources released.")
 
 
 def start_pose_tracking():
-    global tracking, right_curl_count, left_curl_count
-    if not tracking:
-        right_curl_count = 0  # Reset right curl count
-        left_curl_count = 0  # Reset left curl count
-        tracking = True
+    """Run pose tracking on this thread until stopped; does nothing if it is already running."""
+    if not run_lock.acquire(blocking=False):
+        return
+    try:
+        stop_requested.clear()
         print("Starting tracking...")
-        track_body()
+        track_body(stop_requested)
+    finally:
+        run_lock.release()
 
 
 def stop_pose_tracking():
-    global tracking
-    tracking = False
-    print("Stopping tracking...")
\ No newline at end of file
+    stop_requested.set()
+    print("Stopping tracking...")
@@ -0,0 +1,101 @@
+import cv2
+import mediapipe as mp
+import numpy as np
+
+WHITE_COLOR = (255, 255, 255)
+
+# Landmarks below this visibility are not drawn, matching mediapipe's drawing_utils
+VISIBILITY_THRESHOLD = 0.5
+
+
+class LandmarkRenderer:
+    """Draw landmark arrays with a fixed connection set and drawing style.
+
+    Connections are converted to an index array once. Every segment of a landmark set is then
+    rasterized by a single cv2.polylines call, and points are drawn the same way as zero-length
+    segments, instead of one cv2.line/cv2.circle call per element.
+    """
+
+    def __init__(self, connections, line_color=WHITE_COLOR, line_thickness=2, point_color=None, point_radius=2,
+                 point_thickness=2, use_visibility=False):
+        self.connections = np.array(sorted(connections), dtype=np.intp).reshape(-1, 2)
+        self.line_color = line_color
+        self.line_thickness = line_thickness
+        self.point_color = point_color
+        # Same sizes as drawing_utils: a white border ring, then the colored circle
+        border_radius = max(point_radius + 1, int(point_radius * 1.2))
+        self.border_size = 2 * border_radius + point_thickness
+        self.point_size = 2 * point_radius + point_thickness
+        self.use_visibility = use_visibility
+
+    def draw(self, image, landmarks, line_color=None, point_color=None):
+        """Draw one (N, 4) landmark array or a stack of them shaped (K, N, 4); None draws nothing."""
+        if landmarks is None:
+            return image
+        landmarks = np.asarray(landmarks)
+        if landmarks.ndim == 2:
+            landmarks = landmarks[None]
+        if landmarks.size == 0:
+            return image
+
+        height, width = image.shape[:2]
+        points = (landmarks[..., :2] * (width, height)).astype(np.int32)
+
+        # Skip points outside the image or not visible enough, as drawing_utils does
+        valid = ((landmarks[..., 0] >= 0) & (landmarks[..., 0] <= 1) &
+                 (landmarks[..., 1] >= 0) & (landmarks[..., 1] <= 1))
+        if self.use_visibility:
+            valid &= landmarks[..., 3] >= VISIBILITY_THRESHOLD
+
+        if len(self.connections):
+            segments = points[:, self.connections]  # (K, connections, 2, 2)
+            drawn = valid[:, self.connections].all(axis=-1)
+            cv2.polylines(image, segments[drawn], False, line_color or self.line_color, self.line_thickness)
+
+        point_color = point_color or self.point_color
+        if point_color is not None:
+            dots = np.repeat(points[valid][:, None], 2, axis=1)  # Zero-length segments draw round dots
+            cv2.polylines(image, dots, False, WHITE_COLOR, self.border_size)
+            cv2.polylines(image, dots, False, point_color, self.point_size)
+        return image
+
+
+class OverlayBuffer:
+    """Preallocated black overlay that landmarks are drawn into once per frame.
+
+    The overlay itself serves as the landmarks-only secondary frame, and `composite` copies its
+    drawn pixels onto the camera frame, so nothing is drawn twice.
+    """
+
+    def __init__(self):
+        self.overlay = None
+        self.mask = None
+
+    def clear(self, shape):
+        """Return the overlay for a frame of this shape, cleared to black."""
+        if self.overlay is None or self.overlay.shape != shape:
+            self.overlay = np.zeros(shape, dtype=np.uint8)
+            self.mask = np.zeros(shape[:2], dtype=np.uint8)
+        else:
+            self.overlay.fill(0)
+        return self.overlay
+
+    def composite(self, frame):
+        """Copy every drawn (non-black) overlay pixel onto the frame."""
+        cv2.cvtColor(self.overlay, cv2.COLOR_BGR2GRAY, dst=self.mask)
+        cv2.copyTo(self.overlay, self.mask, frame)
+        return frame
+
+
+# Renderers for the tracker styles; drawing specs are built once at import
+mp_pose = mp.solutions.pose
+mp_hands = mp.solutions.hands
+mp_face_mesh = mp.solutions.face_mesh
+_tesselation_style = mp.solutions.drawing_styles.get_default_face_mesh_tesselation_style()
+
+face_mesh_renderer = LandmarkRenderer(mp_face_mesh.FACEMESH_TESSELATION, line_color=_tesselation_style.color,
+                                      line_thickness=_tesselation_style.thickness)
+body_pose_renderer = LandmarkRenderer(mp_pose.POSE_CONNECTIONS, line_color=(0, 255, 0), point_color=(255, 255, 0),
+                                      use_visibility=True)
+hands_renderer = LandmarkRenderer(mp_hands.HAND_CONNECTIONS, line_color=(255, 255, 255), point_color=(255, 0, 255))
+skeleton_renderer = LandmarkRenderer(mp_pose.POSE_CONNECTIONS, use_visibility=True)
@@ -0,0 +1,111 @@
+import cv2
+import numpy as np
+
+from landmark_arrays import LandmarkResults
+
+# Longest side, in pixels, of the image handed to a model
+DEFAULT_INFERENCE_SIZE = 640
+
+
+class InputTransform:
+    """Maps normalized landmarks from a cropped model input back to the full frame."""
+
+    def __init__(self, x0, y0, width, height, frame_width, frame_height):
+        self.scale_x = width / frame_width
+        self.scale_y = height / frame_height
+        self.offset_x = x0 / frame_width
+        self.offset_y = y0 / frame_height
+
+    @property
+    def is_identity(self):
+        return self.scale_x == 1.0 and self.scale_y == 1.0 and self.offset_x == 0.0 and self.offset_y == 0.0
+
+    def restore(self, array):
+        """Map (..., N, 4) landmark arrays to full-frame coordinates in place."""
+        array[..., 0] = array[..., 0] * self.scale_x + self.offset_x
+        array[..., 1] = array[..., 1] * self.scale_y + self.offset_y
+        array[..., 2] *= self.scale_x  # z uses the same scale as x
+        return array
+
+    def restore_landmarks(self, landmark_list):
+        """Map a NormalizedLandmarkList to full-frame coordinates in place."""
+        for landmark in landmark_list.landmark:
+            landmark.x = landmark.x * self.scale_x + self.offset_x
+            landmark.y = landmark.y * self.scale_y + self.offset_y
+            landmark.z *= self.scale_x
+        return landmark_list
+
+    def restore_results(self, results):
+        """Map every landmark set in a MediaPipe result (or LandmarkResults) in place."""
+        if self.is_identity:
+            return results
+        if isinstance(results, LandmarkResults):
+            for array in results.arrays.values():
+                self.restore(array)
+            results.invalidate()
+            return results
+
+        for name in ("pose_landmarks", "multi_hand_landmarks", "multi_face_landmarks"):
+            landmarks = getattr(results, name, None)
+            if landmarks is None:
+                continue
+            for landmark_list in landmarks if isinstance(landmarks, list) else [landmarks]:
+                self.restore_landmarks(landmark_list)
+        return results
+
+
+def landmark_bbox(landmarks):
+    """Normalized (x0, y0, x1, y1) bounding box of one or more (N, 4) landmark arrays."""
+    points = np.concatenate([np.asarray(array)[:, :2] for array in landmarks])
+    return (*points.min(axis=0), *points.max(axis=0))
+
+
+class RoiPreprocessor:
+    """Crop a padded region of interest and downscale it before inference.
+
+    `prepare` returns the image to feed the model together with the InputTransform that maps
+    its landmarks back to the full frame. Without a region the whole frame is used and only
+    downscaled, which needs no landmark mapping at all.
+    """
+
+    def __init__(self, inference_size=DEFAULT_INFERENCE_SIZE, padding=0.25, min_size=0.15):
+        self.inference_size = inference_size
+        self.padding = padding  # Margin added on each side, as a fraction of the region size
+        self.min_size = min_size  # Smallest region side, as a fraction of the frame's short side
+        self.region = None
+
+    def track(self, landmarks):
+        """Use the bounding box of a list of (N, 4) landmark arrays as the next region.
+
+        An empty list or None resets to the full frame.
+        """
+        self.region = landmark_bbox(landmarks) if landmarks else None
+
+    def prepare(self, rgb_frame, region=None):
+        frame_height, frame_width = rgb_frame.shape[:2]
+        region = region if region is not None else self.region
+
+        x0, y0, x1, y1 = 0, 0, frame_width, frame_height
+        if region is not None:
+            # Pad the normalized box, keep it square-ish and at least min_size, then clamp
+            left, top, right, bottom = region
+            center_x = (left + right) / 2 * frame_width
+            center_y = (top + bottom) / 2 * frame_height
+            side = max((right - left) * frame_width, (bottom - top) * frame_height)
+            side = max(side * (1 + 2 * self.padding), self.min_size * min(frame_width, frame_height))
+            x0 = int(max(center_x - side / 2, 0))
+            y0 = int(max(center_y - side / 2, 0))
+            x1 = int(min(center_x + side / 2, frame_width))
+            y1 = int(min(center_y + side / 2, frame_height))
+            if x1 - x0 < 2 or y1 - y0 < 2:
+                x0, y0, x1, y1 = 0, 0, frame_width, frame_height
+
+        crop = rgb_frame[y0:y1, x0:x1]
+        width, height = x1 - x0, y1 - y0
+        scale = self.inference_size / max(width, height) if self.inference_size else 1.0
+        if scale < 1.0:
+            image = cv2.resize(crop, (max(int(width * scale), 1), max(int(height * scale), 1)),
+                               interpolation=cv2.INTER_AREA)
+        else:
+            image = np.ascontiguousarray(crop)
+        return image, InputTransform(x0, y0, width, height, frame_width, frame_height)
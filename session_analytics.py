@@ -0,0 +1,409 @@
+# session_analytics.py
+#
+# Rep statistics over recorded sessions: each rep's timing, range of motion, tempo and
+# left/right symmetry, plus a per-session summary, written as CSV or Parquet tables.
+#
+#   python session_analytics.py recordings/*.lmk landmarks/*.npz --reps reps.csv --summary summary.parquet
+
+import argparse
+import csv
+import glob
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from exercises import CURLS, EXERCISES, RepCounter
+from landmark_recorder import POSE, LandmarkRecording
+
+# Frames read from a recording at a time; memory use stays flat however long the session is
+CHUNK_FRAMES = 65536
+
+# The extensions before and after a rep are measured over at most this long, so a rest between
+# sets closes the last rep and frames of the rest are not kept between chunks
+MAX_REP_SECONDS = 30.0
+
+# A rep starts and ends where the limb is within this many degrees of its full extension
+TEMPO_TOLERANCE = 5.0
+
+REP_COLUMNS = ("session", "exercise", "rep", "start_time", "peak_time", "end_time", "duration", "concentric",
+               "eccentric", "min_angle", "max_angle", "range_of_motion", "left_range", "right_range", "symmetry")
+
+SUMMARY_COLUMNS = ("session", "exercise", "reps", "mean_duration", "mean_concentric", "mean_eccentric",
+                   "mean_range", "min_range", "max_range", "mean_symmetry", "rep_balance", "range_balance")
+
+
+def empty_reps():
+    types = {"session": object, "exercise": object, "rep": np.int64}
+    return {column: np.zeros(0, dtype=types.get(column, np.float64)) for column in REP_COLUMNS}
+
+
+def concat_tables(tables, columns):
+    tables = list(tables)
+    if not tables:
+        return {column: np.zeros(0) for column in columns}
+    return {column: np.concatenate([table[column] for table in tables]) for column in columns}
+
+
+def balance(left, right):
+    """Smaller over larger of two measurements (1.0 is perfectly even), NaN when both are 0."""
+    left, right = np.asarray(left, dtype=np.float64), np.asarray(right, dtype=np.float64)
+    larger = np.maximum(left, right)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(larger > 0, np.minimum(left, right) / larger, np.nan)
+
+
+def segment_frames(starts, ends, count):
+    """Segment of each of `count` frames for non-overlapping [start, end) segments in order, -1 outside."""
+    frames = np.arange(count)
+    label = np.searchsorted(starts, frames, side="right") - 1
+    inside = (label >= 0) & (frames < ends[np.maximum(label, 0)])
+    return np.where(inside, label, -1)
+
+
+def first_and_last(label, condition):
+    """First and last frame of every labelled segment where the condition holds (it must hold in each)."""
+    matches = np.flatnonzero((label >= 0) & condition)
+    _, first = np.unique(label[matches], return_index=True)
+    _, last = np.unique(label[matches[::-1]], return_index=True)
+    return matches[first], matches[::-1][last]
+
+
+def reduce_segments(ufunc, values, starts, ends):
+    """ufunc reduced over each non-empty [start, end) of values in one reduceat; odd slots are the gaps."""
+    bounds = np.column_stack([starts, ends]).ravel()
+    return ufunc.reduceat(np.concatenate([values, values[-1:]]), bounds, axis=0)[::2]
+
+
+class SessionAnalyzer:
+    """Segment and measure the reps in a pose landmark sequence that is fed in batches.
+
+    Between reps the rep counter is in the start position, with the limb extended. Each rep is
+    measured over the extension before it, the movement to the end position and back, and
+    the extension after it. The extremes of the two extensions and the peak (the furthest
+    point towards the end position) give the range of motion. The rep starts when the limb
+    leaves the extension and ends when it arrives back, both within TEMPO_TOLERANCE degrees of
+    the extension's extreme, so rests between reps don't count towards tempo. The peak splits
+    the rep into its concentric and eccentric phases.
+
+    Each extension is cut to max_rep_seconds next to the rep. A rep is reported once the next
+    one begins or its extension reaches that length, or by finish() at the end of the data.
+    The rep counter state and the frames of unfinished reps carry over between feed() calls,
+    and the results don't depend on how the frames are batched. That lets a multi-hour
+    recording be processed in fixed-size chunks, and lets a live session pass in whatever it
+    has buffered. Every reduction runs over whole batches; only the exercises are looped over.
+    """
+
+    def __init__(self, exercises=CURLS, session="", max_rep_seconds=MAX_REP_SECONDS):
+        self.rep_counter = RepCounter(exercises)
+        self.exercises = self.rep_counter.exercises
+        self.joints = self.rep_counter.joint_angles.joints
+        self.session = session
+        self.max_rep_seconds = max_rep_seconds
+
+        # Joint angle columns on each side of the body per exercise, for the symmetry figures
+        self.sides = []
+        for exercise in self.exercises:
+            self.sides.append(tuple([self.joints.index(joint) for joint in exercise.joints if joint.startswith(side)]
+                                    for side in ("left_", "right_")))
+        self.reset()
+
+    def reset(self):
+        self.rep_counter.reset()
+        self.rep_numbers = np.zeros(len(self.exercises), dtype=np.int64)
+        self._clear()
+
+    def _clear(self):
+        # Frames carried over from earlier batches, and the up/down state just before them
+        self.timestamps = np.zeros(0, dtype=np.float64)
+        self.joint_angles = np.zeros((0, len(self.joints)), dtype=np.float32)
+        self.state = np.zeros((0, len(self.exercises)), dtype=bool)
+        self.previous_state = np.zeros(len(self.exercises), dtype=bool)
+
+    def feed(self, timestamps, poses, present=None):
+        """Add consecutive frames of (N, 33, 4) pose landmarks and return the reps they closed.
+
+        `present` masks out frames without a detected pose. The reps come back as a table of
+        REP_COLUMNS arrays.
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        poses = np.asarray(poses)
+        if present is not None:
+            present = np.asarray(present, dtype=bool)
+            timestamps, poses = timestamps[present], poses[present]
+
+        joint_angles = self.rep_counter.joint_angles(poses).astype(np.float32)
+        state, _ = self.rep_counter.count_angles(joint_angles @ self.rep_counter.weights.T)
+
+        carried = len(self.timestamps)
+        self.timestamps = np.concatenate([self.timestamps, timestamps])
+        self.joint_angles = np.concatenate([self.joint_angles, joint_angles])
+        self.state = np.concatenate([self.state, state])
+        return self._measure(carried, final=False)
+
+    def finish(self):
+        """Report the reps still open at the end of the data; later frames start a new sequence."""
+        reps = self._measure(len(self.timestamps), final=True)
+        self.rep_counter.reset()
+        self._clear()
+        return reps
+
+    def _measure(self, carried, final):
+        if not len(self.timestamps):
+            return empty_reps()
+        angles = self.joint_angles @ self.rep_counter.weights.T
+        previous = np.concatenate([self.previous_state[None], self.state[:-1]])
+        tables = []
+        keep = len(self.timestamps)
+        for column, exercise in enumerate(self.exercises):
+            table, needed = self._segment(column, exercise, angles[:, column], self.state[:, column],
+                                          previous[:, column], carried, final)
+            tables.append(table)
+            keep = min(keep, needed)
+
+        # Drop the frames no unfinished rep needs
+        if keep:
+            self.previous_state = self.state[keep - 1].copy()
+        self.timestamps = self.timestamps[keep:].copy()
+        self.joint_angles = self.joint_angles[keep:].copy()
+        self.state = self.state[keep:].copy()
+        return concat_tables(tables, REP_COLUMNS)
+
+    def _segment(self, column, exercise, angle, up, previous, carried, final):
+        """Measure the reps of one exercise closed after frame `carried`; also returns the first frame still needed."""
+        count = len(angle)
+        timestamps = self.timestamps
+        sign = self.rep_counter.sign[column]
+        signed = angle * sign  # Grows towards the end position
+        rises = np.flatnonzero(up & ~previous)
+        falls = np.flatnonzero(~up & previous)
+
+        # Rep k: extension [befores, rises), movement [rises, falls), extension [falls, afters).
+        # The extension before runs from the previous fall (or the first frame kept) and the one
+        # after to the next rise, each cut to max_rep_seconds.
+        fall_index = np.searchsorted(falls, rises)
+        has_fall = fall_index < len(falls)
+        befores = np.searchsorted(timestamps, timestamps[rises] - self.max_rep_seconds)
+        befores[fall_index > 0] = np.maximum(befores[fall_index > 0], falls[fall_index[fall_index > 0] - 1])
+        rep_falls = falls[np.minimum(fall_index, len(falls) - 1)] if len(falls) else np.zeros_like(rises)
+        afters = np.minimum(np.append(rises[1:], count),
+                            np.searchsorted(timestamps, timestamps[rep_falls] + self.max_rep_seconds))
+        afters[~has_fall] = count
+
+        # Only the newest rep can still be open; a later one starts after max_rep_seconds of rest
+        if len(rises) and afters[-1] == count:
+            needed = befores[-1]
+        else:
+            needed = int(np.searchsorted(timestamps, timestamps[-1] - self.max_rep_seconds))
+
+        # Reps that closed before frame `carried` were reported by an earlier call
+        closed = has_fall & (afters >= carried) & (befores < rises)
+        if not final:
+            closed &= afters < count
+        if not closed.any():
+            return empty_reps(), needed
+        rises, next_rises, befores = rises[closed], afters[closed], befores[closed]
+        falls = rep_falls[closed]
+
+        extended_before = reduce_segments(np.minimum, signed, befores, rises)
+        peak = reduce_segments(np.maximum, signed, rises, falls)
+        extended_after = reduce_segments(np.minimum, signed, falls, next_rises)
+
+        label = segment_frames(befores, rises, count)
+        _, starts = first_and_last(label, signed <= (extended_before + TEMPO_TOLERANCE)[label])
+        label = segment_frames(rises, falls, count)
+        peaks, _ = first_and_last(label, signed >= peak[label])
+        label = segment_frames(falls, next_rises, count)
+        ends, _ = first_and_last(label, signed <= (extended_after + TEMPO_TOLERANCE)[label])
+
+        extended = np.minimum(extended_before, extended_after) * sign
+        min_angle = np.minimum(extended, peak * sign).astype(np.float64)
+        max_angle = np.maximum(extended, peak * sign).astype(np.float64)
+        joint_range = (reduce_segments(np.maximum, self.joint_angles, befores, next_rises)
+                       - reduce_segments(np.minimum, self.joint_angles, befores, next_rises))
+
+        left_columns, right_columns = self.sides[column]
+        reps = len(rises)
+        left_range = joint_range[:, left_columns].mean(axis=1) if left_columns else np.full(reps, np.nan)
+        right_range = joint_range[:, right_columns].mean(axis=1) if right_columns else np.full(reps, np.nan)
+
+        numbers = self.rep_numbers[column] + np.arange(1, reps + 1)
+        self.rep_numbers[column] += reps
+        start_time, peak_time, end_time = self.timestamps[starts], self.timestamps[peaks], self.timestamps[ends]
+        table = {
+            "session": np.full(reps, self.session, dtype=object),
+            "exercise": np.full(reps, exercise.name, dtype=object),
+            "rep": numbers,
+            "start_time": start_time,
+            "peak_time": peak_time,
+            "end_time": end_time,
+            "duration": end_time - start_time,
+            "concentric": peak_time - start_time,
+            "eccentric": end_time - peak_time,
+            "min_angle": min_angle,
+            "max_angle": max_angle,
+            "range_of_motion": max_angle - min_angle,
+            "left_range": left_range.astype(np.float64),
+            "right_range": right_range.astype(np.float64),
+            "symmetry": balance(left_range, right_range),
+        }
+        return table, needed
+
+
+def read_pose_chunks(path, chunk_frames=CHUNK_FRAMES):
+    """Yield (timestamps, poses, present) chunks from a landmark recording (.lmk) or a batch_process .npz."""
+    if path.endswith(".npz"):
+        with np.load(path) as data:
+            if "pose" not in data:
+                raise ValueError(f"{path} has no pose landmarks.")
+            timestamps, poses, present = data["timestamps"], data["pose"][:, 0], data["pose_present"][:, 0]
+        for first in range(0, len(timestamps), chunk_frames):
+            last = first + chunk_frames
+            yield timestamps[first:last], poses[first:last], present[first:last]
+        return
+
+    recording = LandmarkRecording(path)
+    for first in range(0, len(recording), chunk_frames):
+        records = recording[first:first + chunk_frames]
+        yield records["timestamp"], records["pose"], records["present"][:, POSE].astype(bool)
+
+
+def analyze_recording(path, exercises=CURLS, chunk_frames=CHUNK_FRAMES):
+    """Measure every rep in one recording; returns (rep table, frame count, seconds)."""
+    session = os.path.splitext(os.path.basename(path))[0]
+    analyzer = SessionAnalyzer(exercises, session=session)
+    tables = []
+    frames = 0
+    start = time.perf_counter()
+    for timestamps, poses, present in read_pose_chunks(path, chunk_frames):
+        tables.append(analyzer.feed(timestamps, poses, present))
+        frames += len(timestamps)
+    tables.append(analyzer.finish())
+    return concat_tables(tables, REP_COLUMNS), frames, time.perf_counter() - start
+
+
+def summarize(reps):
+    """Per session and exercise totals and means of a rep table, as a table of SUMMARY_COLUMNS arrays.
+
+    rep_balance and range_balance compare an exercise done on one side, such as left_curl,
+    with its other-side counterpart in the same session.
+    """
+    if not len(reps["rep"]):
+        return {column: np.zeros(0) for column in SUMMARY_COLUMNS}
+    keys = np.char.add(np.char.add(reps["session"].astype(str), "\0"), reps["exercise"].astype(str))
+    groups, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    counts = np.bincount(inverse, minlength=len(groups))
+
+    def mean(column):
+        values = reps[column]
+        valid = ~np.isnan(values)
+        total = np.bincount(inverse[valid], values[valid], minlength=len(groups))
+        number = np.bincount(inverse[valid], minlength=len(groups))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(number > 0, total / number, np.nan)
+
+    ranges = reps["range_of_motion"]
+    min_range = np.full(len(groups), np.inf)
+    max_range = np.full(len(groups), -np.inf)
+    np.minimum.at(min_range, inverse, ranges)
+    np.maximum.at(max_range, inverse, ranges)
+
+    summary = {
+        "session": reps["session"][first],
+        "exercise": reps["exercise"][first],
+        "reps": counts,
+        "mean_duration": mean("duration"),
+        "mean_concentric": mean("concentric"),
+        "mean_eccentric": mean("eccentric"),
+        "mean_range": mean("range_of_motion"),
+        "min_range": min_range,
+        "max_range": max_range,
+        "mean_symmetry": mean("symmetry"),
+    }
+
+    # Pair left_X with right_X in the same session
+    index = {(session, exercise): row for row, (session, exercise)
+             in enumerate(zip(summary["session"], summary["exercise"]))}
+    other = np.full(len(groups), -1)
+    for (session, exercise), row in index.items():
+        for side, opposite in (("left_", "right_"), ("right_", "left_")):
+            if exercise.startswith(side):
+                other[row] = index.get((session, opposite + exercise[len(side):]), -1)
+    paired = other >= 0
+    summary["rep_balance"] = np.where(paired, balance(counts, counts[other]), np.nan)
+    summary["range_balance"] = np.where(paired, balance(summary["mean_range"], summary["mean_range"][other]), np.nan)
+    return summary
+
+
+def write_table(path, table, columns):
+    """Write a table of column arrays as Parquet (needs pyarrow) when the path ends in .parquet, else CSV."""
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Writing Parquet needs pyarrow (pip install pyarrow); use a .csv path instead.")
+        pq.write_table(pa.table({column: table[column].tolist() for column in columns}), path)
+        return
+
+    values = [np.round(table[column], 4).tolist() if table[column].dtype.kind == "f" else table[column].tolist()
+              for column in columns]
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        writer.writerows(zip(*values))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rep, range of motion, tempo and symmetry statistics for recorded sessions.")
+    parser.add_argument("inputs", nargs="+", help="Landmark recordings (.lmk) or batch_process .npz files, or globs")
+    parser.add_argument("--exercises", nargs="+", choices=sorted(EXERCISES), default=list(CURLS))
+    parser.add_argument("--reps", default="reps.csv", help="Per-rep table (.csv, or .parquet with pyarrow)")
+    parser.add_argument("--summary", default="summary.csv", help="Per-session table (.csv, or .parquet with pyarrow)")
+    parser.add_argument("--chunk-frames", type=int, default=CHUNK_FRAMES, help="Frames read at a time")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of worker processes")
+    args = parser.parse_args()
+
+    paths = [path for pattern in args.inputs for path in (sorted(glob.glob(pattern)) or [pattern])]
+    missing = [path for path in paths if not os.path.isfile(path)]
+    for path in missing:
+        print(f"Warning: No such file: {path}")
+    paths = [path for path in paths if path not in missing]
+    if not paths:
+        print("Error: No recordings found.")
+        return 1
+
+    tables = []
+    total_frames = 0
+    start = time.perf_counter()
+    workers = max(1, min(args.workers, len(paths)))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = {executor.submit(analyze_recording, path, args.exercises, args.chunk_frames): path for path in paths}
+        for future in as_completed(futures):
+            try:
+                reps, frames, seconds = future.result()
+            except Exception as e:
+                print(f"Error: {futures[future]}: {e}")
+                continue
+            tables.append(reps)
+            total_frames += frames
+            print(f"{futures[future]}: {len(reps['rep'])} reps in {frames} frames ({seconds:.1f}s)")
+
+    reps = concat_tables(tables, REP_COLUMNS)
+    order = np.lexsort((reps["start_time"], reps["exercise"].astype(str), reps["session"].astype(str)))
+    reps = {column: values[order] for column, values in reps.items()}
+    try:
+        write_table(args.reps, reps, REP_COLUMNS)
+        write_table(args.summary, summarize(reps), SUMMARY_COLUMNS)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        return 1
+    print(f"Wrote {len(reps['rep'])} reps from {total_frames} frames to {args.reps} and {args.summary} "
+          f"in {time.perf_counter() - start:.1f}s")
+    return 0 if tables else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from exercises import RepCounter
+from kinematics import PoseLandmark
+from session_analytics import REP_COLUMNS, SessionAnalyzer, concat_tables
+
+FPS = 30
+
+
+def curls(reps=5, low=35.0, high=165.0, period=2.0):
+    """Elbow angles of `reps` curls starting and ending at full extension."""
+    phase = np.arange(int(period * FPS)) / FPS
+    return np.tile((low + high) / 2 + (high - low) / 2 * np.cos(2 * np.pi * phase / period), reps)
+
+
+def rest(seconds, angle=165.0):
+    return np.full(int(seconds * FPS), angle)
+
+
+def session(*parts):
+    """Timestamps and (N, 33, 4) poses of a right arm following the given elbow angles."""
+    angles = np.radians(np.concatenate(parts))
+    timestamps = np.arange(len(angles)) / FPS
+    poses = np.zeros((len(angles), 33, 4), dtype=np.float32)
+    poses[..., 3] = 1
+    poses[:, PoseLandmark.RIGHT_SHOULDER, :2] = (0.5, 0.3)
+    poses[:, PoseLandmark.RIGHT_ELBOW, :2] = (0.5, 0.5)
+    poses[:, PoseLandmark.RIGHT_WRIST, 0] = 0.5 + 0.15 * np.sin(angles)
+    poses[:, PoseLandmark.RIGHT_WRIST, 1] = 0.5 - 0.15 * np.cos(angles)
+    return timestamps, poses
+
+
+def analyze(timestamps, poses, chunk_frames):
+    analyzer = SessionAnalyzer(("right_curl",))
+    tables = [analyzer.feed(timestamps[first:first + chunk_frames], poses[first:first + chunk_frames])
+              for first in range(0, len(timestamps), chunk_frames)]
+    tables.append(analyzer.finish())
+    return concat_tables(tables, REP_COLUMNS)
+
+
+SESSIONS = {
+    "sets with long rests": (curls(), rest(90), curls(), rest(90), curls(), rest(5)),
+    "rest after the last rep": (curls(), rest(31)),
+    "short rests": (curls(high=170), rest(3), curls(high=170), rest(29.9), curls(high=170)),
+}
+
+
+@pytest.mark.parametrize("parts", SESSIONS.values(), ids=SESSIONS.keys())
+def test_chunked_matches_one_pass(parts):
+    timestamps, poses = session(*parts)
+    counter = RepCounter(("right_curl",))
+    counter.count_batch(poses)
+
+    reps = analyze(timestamps, poses, len(timestamps))
+    assert len(reps["rep"]) == counter.counts[0, 0]
+    for chunk_frames in (1000, 37):
+        chunked = analyze(timestamps, poses, chunk_frames)
+        for column in REP_COLUMNS[2:]:
+            np.testing.assert_allclose(chunked[column], reps[column], err_msg=f"{column}, chunks of {chunk_frames}")
+
+
+def test_range_of_motion_uses_full_extension():
+    reps = analyze(*session(curls(high=180)), 1000)
+    np.testing.assert_allclose(reps["range_of_motion"], 145, atol=0.5)
@@ -0,0 +1,194 @@
+import asyncio
+import importlib
+import threading
+from collections import deque, namedtuple
+
+import numpy as np
+
+from landmark_arrays import LandmarkResults, results_to_array
+from multi_person import TrackedPeople
+
+# Tracker module and camera loop behind each pipeline
+TRACKERS = {
+    "pose": ("pose_tracker", "track_body"),
+    "face_mesh": ("face_tracker", "track_face"),
+    "body": ("body_tracker", "track_body_and_hands"),
+}
+
+# One processed frame: landmark arrays by model, person IDs (multi-person pose only), and rep
+# counts (pose only, one row per tracked person)
+TrackerResult = namedtuple("TrackerResult", "timestamp landmarks person_ids counts")
+
+
+def landmark_arrays(results):
+    """Copy a tracker's per-frame results into a {model: (K, N, 4) array} dict."""
+    if isinstance(results, TrackedPeople):
+        return {"pose": results.poses.copy()}
+    if isinstance(results, LandmarkResults):
+        return {model: np.array(array) for model, array in results.arrays.items() if array is not None}
+    return {"pose": results_to_array("pose", results)}
+
+
+class _Subscription:
+    """Items waiting for one async iterator, oldest dropped first once `maxsize` are queued."""
+
+    def __init__(self, maxsize):
+        self.items = deque(maxlen=maxsize)
+        self.ready = asyncio.Event()
+        self.dropped = 0
+
+
+class AsyncStream:
+    """Fan out values published from a tracker thread to any number of async iterators.
+
+    Publishing hands the value to the event loop with a single call_soon_threadsafe, and each
+    iterator awaits an asyncio.Event, so nothing polls. With maxsize=1 a slow consumer simply
+    skips to the latest value.
+    """
+
+    def __init__(self, maxsize=1):
+        self.maxsize = maxsize
+        self.loop = None
+        self.subscriptions = set()
+        self.closed = False
+
+    def __bool__(self):
+        return bool(self.subscriptions)
+
+    def open(self, loop):
+        self.loop = loop
+        self.closed = False
+
+    def publish(self, value):
+        """Deliver a value from any thread (it must not be modified afterwards)."""
+        if self.subscriptions and self.loop is not None:
+            self.loop.call_soon_threadsafe(self._deliver, value)
+
+    def close(self):
+        """End every iterator once it has drained its queue (event loop thread only)."""
+        self.closed = True
+        for subscription in self.subscriptions:
+            subscription.ready.set()
+
+    def _deliver(self, value):
+        for subscription in self.subscriptions:
+            if len(subscription.items) == subscription.items.maxlen:
+                subscription.dropped += 1
+            subscription.items.append(value)
+            subscription.ready.set()
+
+    async def __aiter__(self):
+        subscription = _Subscription(self.maxsize)
+        self.subscriptions.add(subscription)
+        try:
+            while True:
+                while not subscription.items:
+                    if self.closed:
+                        return
+                    subscription.ready.clear()
+                    await subscription.ready.wait()
+                yield subscription.items.popleft()
+        finally:
+            self.subscriptions.discard(subscription)
+
+
+class TrackerSession:
+    """Start, stop and observe one tracker pipeline from an asyncio event loop.
+
+    The tracker loop runs on a worker thread (its inference blocks) and is stopped through a
+    threading.Event owned by this session, so a stop can't be lost or applied to another run.
+    A tracker module holds one loop at a time: starting a pipeline that is already running
+    elsewhere raises RuntimeError instead of silently doing nothing.
+
+        async with TrackerSession("pose") as session:
+            async for result in session.results():
+                print(result.counts)
+    """
+
+    def __init__(self, pipeline, frame_queue=1, result_queue=32):
+        module_name, loop_name = TRACKERS[pipeline]
+        self.pipeline = pipeline
+        self.tracker = importlib.import_module(module_name)
+        self.track = getattr(self.tracker, loop_name)
+        self.stop_event = threading.Event()
+        self.task = None
+        self.frame_stream = AsyncStream(frame_queue)
+        self.result_stream = AsyncStream(result_queue)
+
+    @property
+    def running(self):
+        return self.task is not None and not self.task.done()
+
+    async def start(self):
+        """Start the tracker; returns once its thread is launched. Starting twice is a no-op."""
+        if self.running:
+            return
+        if not self.tracker.run_lock.acquire(blocking=False):
+            raise RuntimeError(f"{self.pipeline} tracking is already running")
+        loop = asyncio.get_running_loop()
+        self.stop_event.clear()
+        self.frame_stream.open(loop)
+        self.result_stream.open(loop)
+        self.task = loop.create_task(self._run())
+
+    async def _run(self):
+        worker = asyncio.ensure_future(asyncio.to_thread(self.track, self.stop_event, self._publish))
+        try:
+            # The thread can't be interrupted: on cancellation ask it to stop and wait for it
+            await asyncio.shield(worker)
+        except asyncio.CancelledError:
+            self.stop_event.set()
+            await worker
+            raise
+        finally:
+            self.tracker.run_lock.release()
+            self.frame_stream.close()
+            self.result_stream.close()
+
+    def _publish(self, timestamp, frame, results):
+        """Tracker thread: copy out what the streams need before the buffers are reused."""
+        if self.frame_stream:
+            self.frame_stream.publish((timestamp, frame.copy()))
+        if self.result_stream:
+            person_ids = results.ids.copy() if isinstance(results, TrackedPeople) else None
+            rep_counter = getattr(self.tracker, "rep_counter", None)
+            counts = rep_counter.counts.copy() if rep_counter is not None else None
+            self.result_stream.publish(TrackerResult(timestamp, landmark_arrays(results), person_ids, counts))
+
+    def request_stop(self):
+        """Ask the tracker to stop without waiting; safe to call from any thread."""
+        self.stop_event.set()
+
+    async def stop(self):
+        """Stop the tracker and wait until its thread has released the camera."""
+        self.request_stop()
+        await self.wait_stopped()
+
+    async def wait_stopped(self):
+        """Wait for the tracker to stop, by request, error or 'q'. Cancelling the wait leaves it running."""
+        if self.task is not None:
+            await asyncio.shield(self.task)
+
+    async def run(self):
+        """Run the tracker until it stops; cancelling this coroutine stops the tracker."""
+        await self.start()
+        try:
+            await self.wait_stopped()
+        except asyncio.CancelledError:
+            await self.stop()
+            raise
+
+    def frames(self):
+        """Async iterator of (timestamp, annotated BGR frame) copies; slow consumers skip frames."""
+        return self.frame_stream.__aiter__()
+
+    def results(self):
+        """Async iterator of TrackerResult, queued up to result_queue per consumer."""
+        return self.result_stream.__aiter__()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()